@@ -1,4 +1,6 @@
 from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
 
 from app.api.players.models import PlayerModel
 
@@ -8,12 +10,14 @@ class ChatModel:
     chat_id: int
     players: list[PlayerModel]
     number_of_players: int
+    last_activity: Optional[datetime] = None
 
     def to_dict(self) -> dict:
         return {
             'chat_id': self.chat_id,
             'players': [p.to_dict() for p in self.players],
-            'number_of_players': self.number_of_players
+            'number_of_players': self.number_of_players,
+            'last_activity': self.last_activity,
         }
 
     @staticmethod
@@ -21,5 +25,6 @@ class ChatModel:
         return ChatModel(
             chat_id=raw['chat_id'],
             players=[PlayerModel.from_dict(p_raw) for p_raw in raw['players']],
-            number_of_players=raw['number_of_players']
+            number_of_players=raw['number_of_players'],
+            last_activity=raw.get('last_activity'),
         )
@@ -1,16 +1,19 @@
-from marshmallow import Schema, fields, validates, ValidationError
+from marshmallow import Schema, fields, validates, ValidationError, validates_schema
 
 from app.api.players.schemes import PlayerInfoResponseSchema
+from app.store.players.pagination import decode_after
 
 
 class ChatInfoResponseSchema(Schema):
     chat_id = fields.Int(required=True)
     players = fields.Nested(PlayerInfoResponseSchema, many=True)
     number_of_players = fields.Int(required=True)
+    last_activity = fields.DateTime(allow_none=True)
 
 
 class ChatsListInfoResponseSchema(Schema):
     chats = fields.Nested(ChatInfoResponseSchema, many=True)
+    next = fields.Str(allow_none=True)
 
 
 class ChatsInfoRequestQuerySchema(Schema):
@@ -19,6 +22,17 @@ class ChatsInfoRequestQuerySchema(Schema):
     offset = fields.Int(missing=0)
     order_by = fields.Str(missing='chat_id')
     order_type = fields.Int(missing=1)
+    after = fields.Str(required=False)
+
+    @validates_schema
+    def validate_after(self, data, **kwargs):
+        if data.get('after') is None:
+            return
+
+        try:
+            decode_after(data['after'], data['order_by'], data['order_type'])
+        except ValueError:
+            raise ValidationError('Bad page token.', 'after')
 
     @validates('limit')
     def validate_limit(self, data, **kwargs):
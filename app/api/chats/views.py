@@ -14,6 +14,7 @@ class ChatsView(View):
     @response_schema(ChatsListInfoResponseSchema, 200)
     async def get(self):
         data, db = self.query_data, self.store.players
+        next_after = None
         if (chat_id := data.get('chat_id')) is not None:
             chat = await db.get_chat_by_id(chat_id)
             chats = [] if not chat else [chat]
@@ -21,11 +22,15 @@ class ChatsView(View):
             limit, offset = data.get('limit'), data.get('offset')
             order_by, order_type = data.get('order_by'), data.get('order_type')
 
-            chats = await db.get_chats_list(
+            chats, next_after = await db.get_chats_list(
                 offset=offset,
                 limit=limit,
                 order_by=order_by,
-                order_type=order_type
+                order_type=order_type,
+                after=data.get('after'),
             )
 
-        return json_response(data={'chats': ChatInfoResponseSchema().dump(chats, many=True)})
+        return json_response(data={
+            'chats': ChatInfoResponseSchema().dump(chats, many=True),
+            'next': next_after,
+        })
@@ -1,5 +1,7 @@
 from dataclasses import dataclass
 
+from app.game.deck import DEFAULT_PENETRATION
+
 
 @dataclass
 class GameSettingsModel:
@@ -10,6 +12,7 @@ class GameSettingsModel:
     bonus: float
     bonus_period: int
     num_of_decks: int
+    penetration: float = DEFAULT_PENETRATION
 
     def to_dict(self) -> dict:
         return {
@@ -20,6 +23,7 @@ class GameSettingsModel:
             'bonus': self.bonus,
             'bonus_period': self.bonus_period,
             'num_of_decks': self.num_of_decks,
+            'penetration': self.penetration,
         }
 
     @staticmethod
@@ -32,4 +36,5 @@ class GameSettingsModel:
             bonus=raw['bonus'],
             bonus_period=raw['bonus_period'],
             num_of_decks=raw['num_of_decks'],
+            penetration=raw.get('penetration', DEFAULT_PENETRATION),
         )
@@ -9,6 +9,7 @@ class GameSettingsInfoResponseSchema(Schema):
     bonus = fields.Float()
     bonus_period = fields.Int()
     num_of_decks = fields.Int()
+    penetration = fields.Float()
 
 
 class GameSettingsPatchRequestSchema(Schema):
@@ -19,6 +20,7 @@ class GameSettingsPatchRequestSchema(Schema):
     bonus = fields.Float()
     bonus_period = fields.Int()
     num_of_decks = fields.Int()
+    penetration = fields.Float()
 
     @validates('min_bet')
     def validate_min_bet(self, data, **kwargs):
@@ -53,6 +55,11 @@ class GameSettingsPatchRequestSchema(Schema):
         if data < 1:
             raise ValidationError('There has to be at least one deck.')
 
+    @validates('penetration')
+    def validate_penetration(self, data, **kwargs):
+        if not 0 < data < 1:
+            raise ValidationError('The penetration must be between 0 and 1.')
+
     @validates_schema
     def validate_min_max_bet(self, data, **kwargs):
         min_bet, max_bet = data.get('min_bet'), data.get('max_bet')
@@ -12,6 +12,7 @@ class PlayerStats:
     max_bet: Optional[float] = None
     average_bet: Optional[float] = None
     max_win: Optional[float] = None
+    total_bet: Optional[float] = None
 
     def to_dict(self) -> dict:
         return {
@@ -22,32 +23,50 @@ class PlayerStats:
             'average_bet': self.average_bet,
             'max_bet': self.max_bet,
             'max_win': self.max_win,
+            'total_bet': self.total_bet,
         }
 
     @staticmethod
     def from_dict(raw: dict) -> 'PlayerStats':
+        """average_bet is derived from the running sum of bets when it is known"""
+        total_bet, number_of_games = raw.get('total_bet'), raw['number_of_games']
+        average_bet = raw.get('average_bet')
+        if total_bet is not None and number_of_games:
+            average_bet = total_bet / number_of_games
+
         return PlayerStats(
             max_cash=raw['max_cash'],
-            number_of_games=raw['number_of_games'],
+            number_of_games=number_of_games,
             number_of_wins=raw['number_of_wins'],
             number_of_defeats=raw['number_of_defeats'],
-            average_bet=raw['average_bet'],
+            average_bet=average_bet,
             max_bet=raw['max_bet'],
             max_win=raw['max_win'],
+            total_bet=total_bet,
         )
 
     def __str__(self) -> str:
         return f'''
-        🔺 Сыграно игр: {self.number_of_games}%0A
-        🔺 Выиграно игр: {self.number_of_wins} {f'({round(self.number_of_wins / self.number_of_games * 100, 2)}%)' if self.number_of_games else ''}%0A
-        🔺 Проиграно игр: {self.number_of_defeats} {f'({round(self.number_of_defeats / self.number_of_games * 100, 2)}%)' if self.number_of_games else ''}%0A
-        🔺 Средняя ставка: {round(self.average_bet, 2) if self.average_bet is not None else None}%0A
-        🔺 Макс. ставка: {self.max_bet}%0A
-        🔺 Макс. выигрыш: {self.max_win}%0A
-        🔺 Макс. денег на счете: {self.max_cash}$%0A
+        🔺 Сыграно игр: {self.number_of_games}\n
+        🔺 Выиграно игр: {self.number_of_wins} {f'({round(self.number_of_wins / self.number_of_games * 100, 2)}%)' if self.number_of_games else ''}\n
+        🔺 Проиграно игр: {self.number_of_defeats} {f'({round(self.number_of_defeats / self.number_of_games * 100, 2)}%)' if self.number_of_games else ''}\n
+        🔺 Средняя ставка: {round(self.average_bet, 2) if self.average_bet is not None else None}\n
+        🔺 Макс. ставка: {self.max_bet}\n
+        🔺 Макс. выигрыш: {self.max_win}\n
+        🔺 Макс. денег на счете: {self.max_cash}$\n
         '''
 
 
+@dataclass
+class PlayerGameResult:
+    vk_id: int
+    cash: float
+    bet: float
+    win: float
+    is_winner: bool
+    is_loser: bool
+
+
 @dataclass
 class PlayerModel:
     vk_id: int
@@ -98,8 +117,8 @@ class PlayerModel:
 
     # def personal_info(self, position: int) -> str:
     #     return f'''
-    #     Статистика для [id{self.vk_id}|{self.first_name} {self.last_name}]%0A%0A%0A
-    #     Позиция в рейтинге: {position}%0A%0A
+    #     Статистика для [id{self.vk_id}|{self.first_name} {self.last_name}]\n\n\n
+    #     Позиция в рейтинге: {position}\n\n
     #     {self.stats}
     #     '''
 
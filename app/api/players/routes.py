@@ -5,6 +5,8 @@ if TYPE_CHECKING:
 
 
 def setup_routes(app: "Application"):
-    from .views import PlayersView
+    from .views import PlayersView, PlayersExportView, PlayersImportView
 
     app.router.add_view("/players", PlayersView)
+    app.router.add_view("/players.export", PlayersExportView)
+    app.router.add_view("/players.import", PlayersImportView)
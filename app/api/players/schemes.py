@@ -1,5 +1,7 @@
 from marshmallow import Schema, fields, validates, ValidationError, validates_schema
 
+from app.store.players.pagination import decode_after
+
 #
 # class BasePlayerSchema(Schema):
 #     chat_id = fields.Int()
@@ -30,6 +32,17 @@ class PlayersInfoRequestQuerySchema(Schema):
     offset = fields.Int(missing=0)
     order_by = fields.Str(missing='cash')
     order_type = fields.Int(missing=-1)
+    after = fields.Str(required=False)
+
+    @validates_schema
+    def validate_after(self, data, **kwargs):
+        if data.get('after') is None:
+            return
+
+        try:
+            decode_after(data['after'], data['order_by'], data['order_type'])
+        except ValueError:
+            raise ValidationError('Bad page token.', 'after')
 
     @validates('limit')
     def validate_limit(self, data, **kwargs):
@@ -54,6 +67,10 @@ class PlayersInfoRequestQuerySchema(Schema):
             raise ValidationError('Order_type must be equal to -1 or 1.')
 
 
+class PlayersExportRequestQuerySchema(Schema):
+    chat_id = fields.Int(required=False)
+
+
 class PlayerStatsSchema(Schema):
     max_cash = fields.Float(required=True)
     number_of_games = fields.Int(required=True)
@@ -80,3 +97,4 @@ class PlayerInfoResponseSchema(Schema):
 
 class PlayersInfoListResponseSchema(Schema):
     players = fields.Nested(PlayerInfoResponseSchema, many=True)
+    next = fields.Str(allow_none=True)
@@ -1,9 +1,14 @@
+import json
+
+from aiohttp.web import StreamResponse
 from aiohttp_apispec import docs, response_schema, querystring_schema, json_schema
+from bson import json_util
 
 from app.api.app.utils import json_response
 from app.api.auth.decorators import auth_required
 from app.api.players.schemes import (PlayersInfoRequestQuerySchema, PlayersInfoListResponseSchema,
-                                     PlayerInfoResponseSchema, PlayerPatchRequestSchema)
+                                     PlayerInfoResponseSchema, PlayerPatchRequestSchema,
+                                     PlayersExportRequestQuerySchema)
 from app.app import View
 
 
@@ -18,16 +23,20 @@ class PlayersView(View):
         limit, offset = data.get('limit'), data.get('offset')
         order_by, order_type = data.get('order_by'), data.get('order_type')
 
-        players = await db.get_players_list(
+        players, next_after = await db.get_players_list(
             vk_id=vk_id,
             chat_id=chat_id,
             offset=offset,
             limit=limit,
             order_by=order_by,
             order_type=order_type,
+            after=data.get('after'),
         )
 
-        return json_response(data={'players': PlayerInfoResponseSchema().dump(players, many=True)})
+        return json_response(data={
+            'players': PlayerInfoResponseSchema().dump(players, many=True),
+            'next': next_after,
+        })
 
     @auth_required
     @docs(tags=['players'], summary='Patch player data', description='Patch player data')
@@ -38,3 +47,38 @@ class PlayersView(View):
         await self.store.players.patch(chat_id, vk_id, self.data)
         player = await self.store.players.get_player_by_vk_id(chat_id=chat_id, vk_id=vk_id)
         return json_response(PlayerInfoResponseSchema().dump(player))
+
+
+class PlayersExportView(View):
+    # players encoded together and written in one chunk
+    CHUNK_SIZE = 500
+
+    @auth_required
+    @docs(tags=['players'], summary='Export players',
+          description='All the players (of the chat) as NDJSON, one line per player in extended JSON')
+    @querystring_schema(PlayersExportRequestQuerySchema)
+    async def get(self):
+        response = StreamResponse(headers={'Content-Type': 'application/x-ndjson; charset=utf-8'})
+        await response.prepare(self.request)
+
+        lines = []
+        async for raw_player in self.store.players.export_players(chat_id=self.query_data.get('chat_id')):
+            lines.append(json.dumps(raw_player, default=json_util.default, ensure_ascii=False))
+            if len(lines) == self.CHUNK_SIZE:
+                await response.write(('\n'.join(lines) + '\n').encode())
+                lines = []
+
+        if lines:
+            await response.write(('\n'.join(lines) + '\n').encode())
+
+        await response.write_eof()
+        return response
+
+
+class PlayersImportView(View):
+    @auth_required
+    @docs(tags=['players'], summary='Import players',
+          description='Upserts players from an NDJSON body in the format of /players.export')
+    async def post(self):
+        result = await self.store.players.import_players(self.request.content)
+        return json_response(data=result.to_dict())
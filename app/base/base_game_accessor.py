@@ -16,6 +16,31 @@ class BaseGameAccessor(BaseAccessor):
     async def disconnect(self) -> None:
         pass
 
+    @abstractmethod
+    async def get_ctx(self, chat: int) -> tuple[Optional[int], Optional[bytes]]:
+        """:return: (state, data) of the chat in one request"""
+        pass
+
+    @abstractmethod
+    async def set_ctx(self,
+                      chat: int,
+                      state: Optional[int],
+                      data: Optional[bytes],
+                      update_state: bool = True,
+                      update_data: bool = True,
+                      ) -> None:
+        """Writes state and data of the chat in one request. None removes the value"""
+        pass
+
+    @abstractmethod
+    async def updates_handled(self, keys: list[str]) -> list[bool]:
+        """True for the updates that have been marked as handled, in one request"""
+        pass
+
+    @abstractmethod
+    async def mark_updates_handled(self, keys: list[str], ttl: int) -> None:
+        pass
+
     @abstractmethod
     async def set_state(self, chat: int, state: int) -> None:
         pass
@@ -29,15 +54,15 @@ class BaseGameAccessor(BaseAccessor):
         pass
 
     @abstractmethod
-    async def set_data(self, chat: int, data: dict) -> None:
+    async def set_data(self, chat: int, data: bytes) -> None:
         pass
 
     @abstractmethod
-    async def get_data(self, chat: int, default: Optional[dict] = None) -> Optional[dict]:
+    async def get_data(self, chat: int, default: Optional[bytes] = None) -> Optional[bytes]:
         pass
 
     @abstractmethod
-    async def update_data(self, chat: int, data: dict) -> None:
+    async def update_data(self, chat: int, data: bytes) -> None:
         pass
 
     @abstractmethod
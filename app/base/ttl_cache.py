@@ -0,0 +1,47 @@
+import time
+from collections import OrderedDict
+from typing import Generic, Hashable, Optional, TypeVar
+
+V = TypeVar('V')
+
+
+class TTLCache(Generic[V]):
+    """LRU cache holding at most `maxsize` values, a value lives `ttl` seconds"""
+
+    def __init__(self, maxsize: int, ttl: float) -> None:
+        self._maxsize = maxsize
+        self._ttl = ttl
+        self._data: OrderedDict[Hashable, tuple[float, V]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable) -> Optional[V]:
+        try:
+            expires_at, value = self._data[key]
+        except KeyError:
+            return None
+
+        if expires_at < time.monotonic():
+            del self._data[key]
+            return None
+
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: V) -> None:
+        if self._maxsize <= 0:
+            return
+
+        self._data[key] = (time.monotonic() + self._ttl, value)
+        self._data.move_to_end(key)
+
+        while len(self._data) > self._maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key: Hashable) -> Optional[V]:
+        item = self._data.pop(key, None)
+        return item[1] if item is not None else None
+
+    def clear(self) -> None:
+        self._data.clear()
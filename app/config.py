@@ -1,5 +1,8 @@
 import yaml
 from dataclasses import dataclass
+from typing import Optional
+
+from app.game.deck import DEFAULT_PENETRATION
 
 
 @dataclass
@@ -17,6 +20,11 @@ class AdminConfig:
 class BotConfig:
     token: str
     group_id: int
+    rate_limit: float = 20  # requests per second
+    senders: int = 50
+    batch_window: float = 0.05
+    users_cache_size: int = 10000
+    users_cache_ttl: float = 3600
 
 
 @dataclass
@@ -33,6 +41,7 @@ class MongoCollections:
     players: str
     admins: str
     game_settings: str
+    chats: str = 'chats'
 
 
 @dataclass
@@ -53,6 +62,13 @@ class RabbitConfig:
     user: str
     password: str
     queue_name: str
+    prefetch_count: int = 10
+    consumers: int = 1
+    exchange_name: str = 'vk_updates'
+    partitions: int = 1
+    worker_partitions: Optional[list[int]] = None
+    publish_window: int = 100
+    publish_retries: int = 3
 
 
 @dataclass
@@ -63,6 +79,26 @@ class GameConfig:
     min_bet: float
     max_bet: float
     num_of_decks: int
+    penetration: float = DEFAULT_PENETRATION
+    settings_cache_ttl: float = 60
+    players_cache_size: int = 10000
+    players_cache_ttl: float = 300
+    chat_summary_interval: float = 5
+
+
+@dataclass
+class WorkerConfig:
+    concurrency: int = 100
+    shutdown_timeout: float = 10
+    dedup_ttl: int = 86400
+
+
+@dataclass
+class PollerConfig:
+    queue_size: int = 100
+    shutdown_timeout: float = 5
+    checkpoint_path: str = 'data/ts'
+    checkpoint_fsync_interval: float = 1
 
 
 @dataclass
@@ -74,6 +110,8 @@ class Config:
     redis: RedisConfig
     rabbit: RabbitConfig
     game: GameConfig
+    worker: WorkerConfig
+    poller: PollerConfig
 
 
 def setup_config(config_path: str) -> Config:
@@ -88,10 +126,7 @@ def setup_config(config_path: str) -> Config:
         session=SessionConfig(
             key=raw_config['session']['key']
         ),
-        bot=BotConfig(
-            token=raw_config['bot']['token'],
-            group_id=raw_config['bot']['group_id']
-        ),
+        bot=BotConfig(**raw_config['bot']),
         mongo=MongoConfig(
             host=raw_config['mongo']['host'],
             port=raw_config['mongo']['port'],
@@ -102,10 +137,13 @@ def setup_config(config_path: str) -> Config:
             collections=MongoCollections(
                 players=raw_config['mongo']['collections']['players'],
                 admins=raw_config['mongo']['collections']['admins'],
-                game_settings=raw_config['mongo']['collections']['game_settings']
+                game_settings=raw_config['mongo']['collections']['game_settings'],
+                chats=raw_config['mongo']['collections'].get('chats', 'chats'),
             ),
         ),
         redis=RedisConfig(**raw_config['redis']),
         game=GameConfig(**raw_config['game']),
         rabbit=RabbitConfig(**raw_config['rabbit']),
+        worker=WorkerConfig(**raw_config.get('worker', {})),
+        poller=PollerConfig(**raw_config.get('poller', {})),
     )
@@ -32,11 +32,21 @@ class Databases:
         await self.redis.disconnect()
         await self.mongo.disconnect()
 
+    async def connect_for_maintenance(self) -> None:
+        await self.mongo.connect()
+        await self.redis.connect()
+
+    async def disconnect_for_maintenance(self) -> None:
+        await self.mongo.disconnect()
+        await self.redis.disconnect()
+
     async def connect_aiohttp(self, _: 'Application') -> None:
         await self.mongo.connect()
+        await self.redis.connect()
 
     async def disconnect_aiohttp(self, _: 'Application') -> None:
         await self.mongo.disconnect()
+        await self.redis.disconnect()
 
 
 def setup_databases(config: Config) -> Databases:
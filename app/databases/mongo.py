@@ -16,6 +16,7 @@ class Collections:
     players: Optional[AsyncIOMotorCollection] = None
     admins: Optional[AsyncIOMotorCollection] = None
     game_settings: Optional[AsyncIOMotorCollection] = None
+    chats: Optional[AsyncIOMotorCollection] = None
 
 
 class Mongo(BaseDatabase):
@@ -46,7 +47,8 @@ class Mongo(BaseDatabase):
         self.collects = Collections(
             players=self.db[cfg.collections.players],
             admins=self.db[cfg.collections.admins],
-            game_settings=self.db[cfg.collections.game_settings]
+            game_settings=self.db[cfg.collections.game_settings],
+            chats=self.db[cfg.collections.chats],
         )
 
     async def disconnect(self) -> None:
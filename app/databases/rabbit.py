@@ -1,7 +1,8 @@
 from typing import Optional
 
-from aio_pika import connect, Channel, Exchange, Queue
+from aio_pika import connect, Channel, Exchange, ExchangeType, Queue
 from aio_pika.connection import ConnectionType
+from aiormq.exceptions import ChannelNotFoundEntity
 
 from app.base.base_database import BaseDatabase
 from app.config import Config, RabbitConfig
@@ -17,12 +18,23 @@ class Rabbit(BaseDatabase):
         self.conn: Optional[ConnectionType] = None
         self.channel: Optional[Channel] = None
         self.exchange: Optional[Exchange] = None
-        self.queue: Optional[Queue] = None
+        self.queues: list[Queue] = []
+        self.consumers: list[tuple[Queue, str]] = []
 
     @property
     def cfg(self) -> RabbitConfig:
         return self.config.rabbit
 
+    @property
+    def worker_partitions(self) -> list[int]:
+        if self.cfg.worker_partitions is None:
+            return list(range(self.cfg.partitions))
+
+        return self.cfg.worker_partitions
+
+    def queue_name(self, partition: int) -> str:
+        return f'{self.cfg.queue_name}.{partition}'
+
     async def connect(self) -> None:
         logger.info('Rabbitmq connected')
         cfg = self.cfg
@@ -34,16 +46,71 @@ class Rabbit(BaseDatabase):
             password=cfg.password,
         )
 
-        self.channel = await self.conn.channel()
-        self.queue = await self.channel.declare_queue(cfg.queue_name, durable=True)
+        await self.open_channel()
+
+        self.queues = []
+        for partition in range(cfg.partitions):
+            queue = await self.channel.declare_queue(self.queue_name(partition), durable=True)
+            await queue.bind(self.exchange, routing_key=str(partition))
+            self.queues.append(queue)
+
+    async def open_channel(self) -> None:
+        """The channel for publishing, the broker confirms every message published to it"""
+        self.channel = await self.conn.channel(publisher_confirms=True)
+        self.exchange = await self.channel.declare_exchange(self.cfg.exchange_name, ExchangeType.DIRECT, durable=True)
+
+    async def reopen_channel(self) -> None:
+        if self.channel is not None and not self.channel.is_closed:
+            return
+
+        logger.warning('Rabbitmq channel is closed, opening a new one')
+        await self.open_channel()
 
     async def disconnect(self) -> None:
         logger.info('Rabbitmq disconnected')
+        self.consumers.clear()
         await self.conn.close()
 
     async def register_consumer(self, func):
-        logger.info('Consumer registered')
-        await self.queue.consume(func)
+        cfg = self.cfg
+
+        for _ in range(cfg.consumers):
+            channel = await self.conn.channel()
+            await channel.set_qos(prefetch_count=cfg.prefetch_count)
+
+            for partition in self.worker_partitions:
+                queue = await channel.declare_queue(self.queue_name(partition), durable=True)
+                self.consumers.append((queue, await queue.consume(func)))
+
+        if 0 in self.worker_partitions:
+            await self._consume_legacy_queue(func)
+
+        logger.info(f'Consumers registered: {cfg.consumers} (prefetch_count={cfg.prefetch_count}, '
+                    f'partitions={self.worker_partitions})')
+
+    async def _consume_legacy_queue(self, func) -> None:
+        """
+        Pollers without partitions published to the queue named queue_name. The worker of partition 0
+        drains it, so the updates left there at the upgrade are handled too. The queue is not created:
+        once it is empty it can be deleted.
+        """
+        channel = await self.conn.channel()
+        try:
+            queue = await channel.declare_queue(self.cfg.queue_name, durable=True, passive=True)
+        except ChannelNotFoundEntity:
+            # the broker closes the channel on a failed passive declare
+            return
+
+        await channel.set_qos(prefetch_count=self.cfg.prefetch_count)
+        self.consumers.append((queue, await queue.consume(func)))
+        logger.info(f'Consuming the legacy queue {self.cfg.queue_name}')
+
+    async def cancel_consumers(self) -> None:
+        for queue, consumer_tag in self.consumers:
+            await queue.cancel(consumer_tag)
+
+        self.consumers.clear()
+        logger.info('Consumers cancelled')
 
 
 def setup_rabbit(config: Config) -> Rabbit:
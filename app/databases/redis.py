@@ -1,4 +1,6 @@
-from typing import Optional
+import asyncio
+from asyncio import Task
+from typing import Optional, Callable
 
 from aioredis import from_url, client
 
@@ -14,6 +16,8 @@ class Redis(BaseDatabase):
     def __init__(self, config: Config) -> None:
         super().__init__(config)
         self.client: Optional[client.Redis] = None
+        self.bin_client: Optional[client.Redis] = None
+        self.listeners: list[Task] = []
 
     @property
     def cfg(self) -> RedisConfig:
@@ -33,9 +37,58 @@ class Redis(BaseDatabase):
             decode_responses=True,
         )
 
+        # for binary values, responses are returned as bytes
+        self.bin_client = from_url(
+            url=f'redis://{cfg.host}',
+            port=cfg.port,
+            # username=cfg.user,
+            password=cfg.password,
+            db=cfg.db,
+        )
+
     async def disconnect(self) -> None:
         logger.info('Redis disconnected')
+
+        for task in self.listeners:
+            task.cancel()
+        await asyncio.gather(*self.listeners, return_exceptions=True)
+        self.listeners.clear()
+
         await self.client.close()
+        await self.bin_client.close()
+
+    async def publish(self, channel: str, message: str) -> None:
+        await self.client.publish(channel, message)
+
+    def subscribe(self, channel: str, callback: Callable[[Optional[str]], None]) -> None:
+        """
+        Calls callback with every message of the channel in the background.
+        After a reconnect it is called with None: messages could have been missed.
+        Errors of the connection and of the callback are logged and the channel is subscribed again.
+        """
+        self.listeners.append(asyncio.create_task(self._listen(channel, callback)))
+
+    async def _listen(self, channel: str, callback: Callable[[Optional[str]], None]) -> None:
+        reconnect_delay = 1
+        resubscribed = False
+        while True:
+            pubsub = self.client.pubsub()
+            try:
+                await pubsub.subscribe(channel)
+                if resubscribed:
+                    callback(None)
+
+                async for message in pubsub.listen():
+                    if message['type'] == 'message':
+                        callback(message['data'])
+            except Exception as e:
+                # CancelledError is not an Exception, so disconnect() still stops the listener
+                logger.exception(f'Subscription to "{channel}" lost: {e}')
+            finally:
+                await pubsub.close()
+
+            await asyncio.sleep(reconnect_delay)
+            resubscribed = True
 
 
 def setup_redis(config: Config) -> Redis:
@@ -0,0 +1,230 @@
+"""
+Compact binary format of a stored game (the output of BlackJackGame.to_dict).
+
+Layout (little-endian), version 2:
+    header   <BBBbddq   version, decks_qty, planned_players_qty, current_player_idx (-1 is None),
+                        min_bet, max_bet, chat_id
+    shoe     <III       number of cards, position of the next card, position of the cut card,
+                        then one byte per card
+    dealer   player
+    <B                  number of players, then every player
+    player   <?qddBBHB  has vk_id, vk_id, cash, bet (NaN is None), score, status, name length, number of cards,
+                        then the utf-8 name and one byte per card
+
+Version 1 kept a deck instead of a shoe:
+    deck     <BI        last card (0xFF is None), number of cards left, then one byte per card (top is the last)
+
+A card is a single byte: its code (see app.game.deck.Card).
+Games stored before the format existed are JSON, they are recognized by the leading '{'.
+Old versions are decoded into the current dict and written back in the current version.
+"""
+
+import json
+import math
+import struct
+from typing import Optional
+
+from app.game.deck import Card, CARDS_IN_DECK, DEFAULT_PENETRATION, cut_position
+from app.game.player import PlayerStatus
+
+VERSION = 2
+_LEGACY_JSON = b'{'[0]
+
+_HEADER = struct.Struct('<BBBbddq')
+_SHOE = struct.Struct('<III')
+_DECK_V1 = struct.Struct('<BI')
+_PLAYER = struct.Struct('<?qddBBHB')
+_COUNT = struct.Struct('<B')
+
+_NO_CARD = 0xFF
+_NO_NAME = 0xFFFF
+
+# the order is a part of the format, append only
+_STATUSES = (
+    PlayerStatus.DEFEAT,
+    PlayerStatus.DRAW,
+    PlayerStatus.WIN,
+    PlayerStatus.IN_GAME,
+    PlayerStatus.BUST,
+    PlayerStatus.BJ_NEED_TO_CLARIFY,
+    PlayerStatus.BJ_WIN32,
+    PlayerStatus.BJ_WIN11,
+    PlayerStatus.BJ_WAITING_FOR_END,
+)
+_STATUS_CODES = {status: code for code, status in enumerate(_STATUSES)}
+
+
+def is_outdated(blob: bytes) -> bool:
+    return blob[0] != VERSION
+
+
+def encode_game(raw: dict) -> bytes:
+    shoe = raw['shoe']
+    current_idx = raw['current_player_idx']
+
+    chunks = [
+        _HEADER.pack(
+            VERSION,
+            raw['decks_qty'],
+            raw['planned_players_qty'],
+            -1 if current_idx is None else current_idx,
+            _pack_number(raw['min_bet']),
+            _pack_number(raw['max_bet']),
+            raw['chat_id'],
+        ),
+        _SHOE.pack(len(shoe['cards']), shoe['position'], shoe['cut']),
+        shoe['cards'],
+        _encode_player(raw['dealer']),
+        _COUNT.pack(len(raw['players'])),
+    ]
+    chunks.extend(_encode_player(p) for p in raw['players'])
+
+    return b''.join(chunks)
+
+
+def decode_game(blob: bytes) -> dict:
+    if blob[0] == _LEGACY_JSON:
+        return _upgrade_v1(_from_legacy(json.loads(blob)))
+
+    version = blob[0]
+    if version not in (1, VERSION):
+        raise ValueError(f'Unknown game format version: {version}')
+
+    version, decks_qty, planned_qty, current_idx, min_bet, max_bet, chat_id = _HEADER.unpack_from(blob, 0)
+    offset = _HEADER.size
+
+    if version == 1:
+        last_card, cards_qty = _DECK_V1.unpack_from(blob, offset)
+        offset += _DECK_V1.size
+        stock = {
+            'deck': {
+                'cards': blob[offset:offset + cards_qty],
+                'last_card': None if last_card == _NO_CARD else last_card,
+            },
+        }
+    else:
+        cards_qty, position, cut = _SHOE.unpack_from(blob, offset)
+        offset += _SHOE.size
+        stock = {
+            'shoe': {
+                'qty': decks_qty,
+                'cards': blob[offset:offset + cards_qty],
+                'position': position,
+                'cut': cut,
+            },
+        }
+    offset += cards_qty
+
+    dealer, offset = _decode_player(blob, offset)
+
+    players_qty, = _COUNT.unpack_from(blob, offset)
+    offset += _COUNT.size
+
+    players = []
+    for _ in range(players_qty):
+        player, offset = _decode_player(blob, offset)
+        players.append(player)
+
+    raw = {
+        'decks_qty': decks_qty,
+        'planned_players_qty': planned_qty,
+        'players': players,
+        'min_bet': _unpack_number(min_bet),
+        'max_bet': _unpack_number(max_bet),
+        'current_player_idx': None if current_idx == -1 else current_idx,
+        'dealer': dealer,
+        'chat_id': chat_id,
+        **stock,
+    }
+
+    return _upgrade_v1(raw) if version == 1 else raw
+
+
+def _encode_player(raw: dict) -> bytes:
+    name = None if raw['name'] is None else raw['name'].encode()
+    vk_id = raw['vk_id']
+
+    return _PLAYER.pack(
+        vk_id is not None,
+        0 if vk_id is None else vk_id,
+        _pack_number(raw['cash']),
+        _pack_number(raw['bet']),
+        raw['score'],
+        _STATUS_CODES[PlayerStatus(raw['status'])],
+        _NO_NAME if name is None else len(name),
+        len(raw['cards']),
+    ) + (name or b'') + raw['cards']
+
+
+def _decode_player(blob: bytes, offset: int) -> tuple[dict, int]:
+    has_vk_id, vk_id, cash, bet, score, status, name_len, cards_qty = _PLAYER.unpack_from(blob, offset)
+    offset += _PLAYER.size
+
+    name = None
+    if name_len != _NO_NAME:
+        name = blob[offset:offset + name_len].decode()
+        offset += name_len
+
+    cards = blob[offset:offset + cards_qty]
+    offset += cards_qty
+
+    return {
+        'name': name,
+        'vk_id': vk_id if has_vk_id else None,
+        'bet': _unpack_number(bet),
+        'cash': _unpack_number(cash),
+        'cards': cards,
+        'score': score,
+        'status': _STATUSES[status],
+    }, offset
+
+
+def _from_legacy(raw: dict) -> dict:
+    """JSON games keep cards as {'rank': 't', 'suit': 'h'}"""
+
+    def codes(cards: list[dict]) -> bytes:
+        return bytes(Card.from_legacy_dict(c) for c in cards)
+
+    deck = raw['deck']
+    deck['cards'] = codes(deck['cards'])
+    deck['last_card'] = None if deck['last_card'] is None else Card.from_legacy_dict(deck['last_card'])
+
+    for player in raw['players'] + [raw['dealer']]:
+        player['cards'] = codes(player['cards'])
+
+    return raw
+
+
+def _upgrade_v1(raw: dict) -> dict:
+    """
+    A v1 deck is a stack of the cards left. It becomes a shoe: the cards that are missing
+    from the stack are considered dealt, the stack follows them in the order it is dealt.
+    """
+    left = raw.pop('deck')['cards']
+    qty = raw['decks_qty']
+
+    counts = [qty] * CARDS_IN_DECK
+    for code in left:
+        counts[code] -= 1
+
+    dealt = b''.join(bytes((code,)) * n for code, n in enumerate(counts))
+    cards = dealt + left[::-1]
+
+    raw['shoe'] = {
+        'qty': qty,
+        'cards': cards,
+        'position': len(dealt),
+        'cut': cut_position(len(cards), DEFAULT_PENETRATION),
+    }
+    return raw
+
+
+def _pack_number(value: Optional[float]) -> float:
+    return math.nan if value is None else value
+
+
+def _unpack_number(value: float) -> Optional[float]:
+    if math.isnan(value):
+        return None
+
+    return int(value) if value.is_integer() else value
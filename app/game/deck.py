@@ -1,41 +1,53 @@
 import random
 from typing import Optional
 
+from app.game.tracking import Trackable
+
+_SUIT_MAP = {
+    'c': '♣',
+    'd': '♦',
+    'h': '♥',
+    's': '♠'
+}
+
+_RANK_MAP = {
+    't': '10',
+    'j': 'Валет',
+    'k': 'Король',
+    'q': 'Дама',
+    'a': 'Туз'
+}
+
+_RANKS = '23456789tjkqa'
+_SUITS = 'cdhs'
+
+CARDS_IN_DECK = len(_RANKS) * len(_SUITS)
+
+# share of the shoe dealt before the cut card
+DEFAULT_PENETRATION = 0.75
+
+# lookup tables indexed by card code
+_CARD_RANKS = tuple(r for r in _RANKS for _ in _SUITS)
+_CARD_SUITS = tuple(s for _ in _RANKS for s in _SUITS)
+_CARD_VALUES = tuple(11 if r == 'a' else 10 if r in 'tjqk' else int(r) for r in _CARD_RANKS)
+_CARD_TEXTS = tuple(f'🔻 {_RANK_MAP.get(r, r)} {_SUIT_MAP[s]}' for r, s in zip(_CARD_RANKS, _CARD_SUITS))
+
+_ACE_VALUE = 11
+_FULL_DECK = bytes(range(CARDS_IN_DECK))
+
+
+class Card(int):
+    """Card code 0..51: rank index * 4 + suit index"""
+
+    __slots__ = ()
 
-class Card:
     sharp_photo = 'photo-202369435_457239076'
     joker_photo = 'photo-202369435_457239075'
-    _SUIT_MAP = {
-        'c': '♣',
-        'd': '♦',
-        'h': '♥',
-        's': '♠'
-    }
-
-    _RANK_MAP = {
-        't': '10',
-        'j': 'Валет',
-        'k': 'Король',
-        'q': 'Дама',
-        'a': 'Туз'
-    }
-
-    _RANKS = '23456789tjkqa'
-    _SUITS = 'cdhs'
-
-    def __init__(self, rank: Optional[int] = None, suit: Optional[int] = None, d: Optional[dict] = None) -> None:
-        if d is None:
-            self._rank = self._RANKS[rank]
-            self._suit = self._SUITS[suit]
-        else:
-            self._rank = d['rank']
-            self._suit = d['suit']
 
-    def to_dict(self) -> dict:
-        return {
-            'rank': self._rank,
-            'suit': self._suit,
-        }
+    @classmethod
+    def from_legacy_dict(cls, d: dict) -> 'Card':
+        """Card of the format {'rank': 't', 'suit': 'h'}"""
+        return cls(_RANKS.index(d['rank']) * len(_SUITS) + _SUITS.index(d['suit']))
 
     @staticmethod
     def fake_card() -> str:
@@ -43,65 +55,109 @@ class Card:
 
     @property
     def card_txt(self) -> str:
-        rank_info = self._RANK_MAP[self._rank] if self._rank.isalpha() else self._rank
-
-        return f'🔻 {rank_info} {self._SUIT_MAP[self._suit]}'
+        return _CARD_TEXTS[self]
 
     @property
     def rank(self) -> str:
-        return self._rank
+        return _CARD_RANKS[self]
 
     @property
     def suit(self) -> str:
-        return self._suit
+        return _CARD_SUITS[self]
 
     def bj_value(self, curr_sum: int) -> int:
-        if self.rank in 'jqkt':
-            ans = 10
-        elif self.rank in '23456789':
-            ans = int(self.rank)
-        else:  # Ace
-            ans = 11 if curr_sum + 11 <= 21 else 1
-
-        return ans
+        return card_value(self, curr_sum)
 
     def __str__(self) -> str:
-        return f'{self.rank} {self.suit}%0a'
+        return f'{self.rank} {self.suit}\n'
 
     def __repr__(self) -> str:
         return f'Card<rank: {self.rank}, suit: {self.suit}>'
 
 
-class Deck:
-    def __init__(self, qty: int = 5, d: Optional[dict] = None) -> None:
+def card_value(code: int, curr_sum: int) -> int:
+    value = _CARD_VALUES[code]
+    if value == _ACE_VALUE and curr_sum + _ACE_VALUE > 21:
+        return 1
+
+    return value
+
+
+def card_text(code: int) -> str:
+    return _CARD_TEXTS[code]
+
+
+class Shoe(Trackable):
+    """
+    Several decks dealt from one bytearray of card codes. The cards are never removed:
+    `position` points to the next card, everything before it has already been dealt.
+    When the position passes the cut card the shoe is reshuffled before the next round.
+    """
+
+    def __init__(self, qty: int = 1, penetration: float = DEFAULT_PENETRATION, d: Optional[dict] = None) -> None:
         if d is None:
-            self._cards = [Card(rank=r, suit=s) for r in range(13) for s in range(4) for _ in range(qty)]
+            self._qty = qty
+            self._cards = bytearray(_FULL_DECK * qty)
+            self._cut = cut_position(len(self._cards), penetration)
             self.shuffle()
-            self._last_card: Optional[Card] = None
         else:
             self._from_dict(d)
 
     def to_dict(self) -> dict:
         return {
-            'cards': [c.to_dict() for c in self._cards],
-            'last_card': self._last_card.to_dict() if self._last_card else None
+            'qty': self._qty,
+            'cards': bytes(self._cards),
+            'position': self._position,
+            'cut': self._cut,
         }
 
     def _from_dict(self, d: dict) -> None:
-        self._cards = [Card(d=card_info) for card_info in d['cards']]
-        self._last_card = Card(d=d['last_card']) if d['last_card'] is not None else None
+        self._qty = d['qty']
+        self._cards = bytearray(d['cards'])
+        self._position = d['position']
+        self._cut = d['cut']
+
+    @property
+    def cards_left(self) -> int:
+        return len(self._cards) - self._position
+
+    @property
+    def is_empty(self) -> bool:
+        return self._position >= len(self._cards)
+
+    @property
+    def needs_reshuffle(self) -> bool:
+        """The cut card has been reached"""
+        return self._position >= self._cut
 
     def shuffle(self) -> None:
         random.shuffle(self._cards)
+        self._position = 0
+        self.mark_dirty()
 
-    @property
-    def last_card(self) -> Card:
-        return self._last_card
+    def shuffle_discards(self, in_play: bytes) -> None:
+        """
+        Emergency reshuffle in the middle of a round: the cards on the table stay dealt,
+        all the other cards go back to the shoe.
+        """
+        counts = [self._qty] * CARDS_IN_DECK
+        for code in in_play:
+            counts[code] -= 1
+
+        rest = bytearray(b''.join(bytes((code,)) * n for code, n in enumerate(counts)))
+        random.shuffle(rest)
 
-    @last_card.setter
-    def last_card(self, value: Card) -> None:
-        self._last_card = value
+        self._cards = bytearray(in_play) + rest
+        self._position = len(in_play)
+        self.mark_dirty()
 
     def get_card(self) -> Card:
-        self._last_card = self._cards.pop()
-        return self.last_card
+        card = self._cards[self._position]
+        self._position += 1
+        self.mark_dirty()
+        return Card(card)
+
+
+def cut_position(cards_qty: int, penetration: float) -> int:
+    """At least one card is dealt before the cut card and at least one card is left behind it"""
+    return min(max(int(cards_qty * penetration), 1), cards_qty - 1)
@@ -2,17 +2,20 @@ from typing import Optional
 
 from app.base.base_game import Game
 from app.base.base_game_accessor import BaseGameAccessor
-from app.game.deck import Deck
+from app.game.codec import encode_game, decode_game, is_outdated
+from app.game.deck import Card, DEFAULT_PENETRATION, Shoe
+from app.game.tracking import Trackable
 from app.store.vk_api.dataclasses import UpdateMessage
 from .player import Player
 from .states import State, StateResolver
 
 
-class BlackJackGame(Game):
+class BlackJackGame(Game, Trackable):
     def __init__(self,
                  chat_id: Optional[int] = None,
                  players_qty: Optional[int] = None,
                  decks_qty: int = 1,
+                 penetration: float = DEFAULT_PENETRATION,
                  min_bet: Optional[float] = None,
                  max_bet: Optional[float] = None,
                  raw: Optional[dict] = None,
@@ -23,7 +26,7 @@ class BlackJackGame(Game):
         else:
             self._decks_qty = decks_qty
             self._planned_players_qty = players_qty
-            self._deck = Deck(decks_qty)
+            self._shoe = Shoe(decks_qty, penetration)
             self._players: list[Player] = []
             self._min_bet = min_bet
             self._max_bet = max_bet
@@ -36,10 +39,11 @@ class BlackJackGame(Game):
             player.cash -= player.bet
 
         self._players.pop(self._players.index(player))
+        self.mark_dirty()
 
     @property
     def min_max_bet_info(self) -> str:
-        return f' - Минимум: {self.min_bet}%0A - Максимум: {self.max_bet}%0A'
+        return f' - Минимум: {self.min_bet}\n - Максимум: {self.max_bet}\n'
 
     @property
     def max_bet(self) -> float:
@@ -49,12 +53,19 @@ class BlackJackGame(Game):
     def min_bet(self) -> float:
         return self._min_bet
 
-    def reset(self) -> None:
+    def reset(self) -> bool:
+        """:return: True if the shoe was reshuffled"""
         for player in self.players_and_dealer:
             player.reset()
 
-        # self._deck = Deck(self._num_of_decks)
         self._current_player_idx = 0
+        self.mark_dirty()
+
+        if self._shoe.needs_reshuffle:
+            self._shoe.shuffle()
+            return True
+
+        return False
 
     @property
     def ratio_of_registered(self) -> str:
@@ -112,14 +123,21 @@ class BlackJackGame(Game):
     def handle_dealer(self):
         dealer = self.dealer
         while dealer.score < 17:
-            dealer.add_card(self.deck.get_card())
+            dealer.add_card(self.draw_card())
 
     def deal_cards(self) -> None:
         for player in self.players:
-            player.add_card(self.deck.get_card())
-            player.add_card(self.deck.get_card())
+            player.add_card(self.draw_card())
+            player.add_card(self.draw_card())
+
+        self._dealer.add_card(self.draw_card())
 
-        self._dealer.add_card(self.deck.get_card())
+    def draw_card(self) -> Card:
+        """The cut card is normally met between rounds, the shoe runs out in the middle of a round only if it is tiny"""
+        if self._shoe.is_empty:
+            self._shoe.shuffle_discards(b''.join(p.cards for p in self.players_and_dealer))
+
+        return self._shoe.get_card()
 
     @property
     def players_and_dealer(self) -> list[Player]:
@@ -135,7 +153,7 @@ class BlackJackGame(Game):
 
     @property
     def players_cashes_info(self) -> str:
-        return '%0A'.join([f'{p} - {p.cash}' for p in self.players])
+        return '\n'.join([f'{p} - {p.cash}' for p in self.players])
 
     @property
     def table(self) -> int:
@@ -147,12 +165,13 @@ class BlackJackGame(Game):
         return players[self._current_player_idx]
 
     @property
-    def deck(self) -> Deck:
-        return self._deck
+    def shoe(self) -> Shoe:
+        return self._shoe
 
     def next_player(self) -> bool:
         """:return: True если есть еще хотя бы один игрок"""
         self._current_player_idx += 1
+        self.mark_dirty()
 
         if self._current_player_idx >= len(self.players):
             self._current_player_idx = None
@@ -173,8 +192,19 @@ class BlackJackGame(Game):
             return False
 
         self._players.append(player)
+        self.mark_dirty()
         return True
 
+    @property
+    def is_dirty(self) -> bool:
+        return self._dirty or self._shoe.is_dirty or any(p.is_dirty for p in self.players_and_dealer)
+
+    def mark_clean(self) -> None:
+        super().mark_clean()
+        self._shoe.mark_clean()
+        for player in self.players_and_dealer:
+            player.mark_clean()
+
     def get_player_by_id(self, vk_id: int) -> Optional[Player]:
         for player in self._players:
             if player.vk_id == vk_id:
@@ -188,7 +218,7 @@ class BlackJackGame(Game):
     def from_dict(self, d: dict) -> None:
         self._decks_qty = d['decks_qty']
         self._planned_players_qty = d['planned_players_qty']
-        self._deck = Deck(d=d['deck'])
+        self._shoe = Shoe(d=d['shoe'])
         self._players = [Player(raw=player_info) for player_info in d['players']]
         self._min_bet = d['min_bet']
         self._max_bet = d['max_bet']
@@ -200,7 +230,7 @@ class BlackJackGame(Game):
         return {
             'decks_qty': self._decks_qty,
             'planned_players_qty': self._planned_players_qty,
-            'deck': self._deck.to_dict(),
+            'shoe': self._shoe.to_dict(),
             'players': [p.to_dict() for p in self._players],
             'min_bet': self._min_bet,
             'max_bet': self._max_bet,
@@ -219,13 +249,49 @@ class GameCtx:
     def proxy(self) -> 'GameCtxProxy':
         return GameCtxProxy(self)
 
+    @staticmethod
+    def _decode_game(blob: Optional[bytes]) -> Optional[BlackJackGame]:
+        if blob is None:
+            return None
+
+        game = BlackJackGame(raw=decode_game(blob))
+        if is_outdated(blob):
+            game.mark_dirty()  # rewrite in the current format on save
+
+        return game
+
+    async def load(self) -> tuple[Optional[State], Optional[BlackJackGame]]:
+        state_id, blob = await self.accessor.get_ctx(chat=self.chat)
+        return (
+            None if state_id is None else StateResolver.get_state(state_id),
+            self._decode_game(blob),
+        )
+
+    async def save(self,
+                   state: Optional[State],
+                   game: Optional[BlackJackGame],
+                   save_state: bool = True,
+                   save_game: bool = True,
+                   ) -> None:
+
+        if not save_state and not save_game:
+            return
+
+        await self.accessor.set_ctx(
+            chat=self.chat,
+            state=None if state is None else state.state_id,
+            data=None if game is None else encode_game(game.to_dict()),
+            update_state=save_state,
+            update_data=save_game,
+        )
+
     async def get_state(self, default: Optional[int] = None) -> Optional[State]:
         state_id = await self.accessor.get_state(chat=self.chat, default=default)
         return default if state_id is None else StateResolver.get_state(state_id)
 
-    async def get_game(self, default: Optional[dict] = None) -> Optional[BlackJackGame]:
-        raw_game = await self.accessor.get_data(chat=self.chat, default=default)
-        return default if raw_game is None else BlackJackGame(raw=raw_game)
+    async def get_game(self, default: Optional[BlackJackGame] = None) -> Optional[BlackJackGame]:
+        blob = await self.accessor.get_data(chat=self.chat)
+        return default if blob is None else self._decode_game(blob)
 
     async def set_state(self, state: State) -> None:
         if state is None:
@@ -237,7 +303,7 @@ class GameCtx:
         if game is None:
             await self.reset_game()
         else:
-            await self.accessor.set_data(chat=self.chat, data=game.to_dict())
+            await self.accessor.set_data(chat=self.chat, data=encode_game(game.to_dict()))
 
     async def reset_game(self) -> None:
         await self.accessor.reset_data(chat=self.chat)
@@ -254,6 +320,7 @@ class GameCtxProxy:
         self._last_state: Optional[State] = None
 
         self._state_is_dirty = False
+        self._game_is_dirty = False
 
         self._closed = True
 
@@ -275,19 +342,25 @@ class GameCtxProxy:
 
     async def load(self) -> None:
         self._closed = False
-        self._state = await self.game_ctx.get_state()
-        self._game = await self.game_ctx.get_game()
+        self._state, self._game = await self.game_ctx.load()
         self._state_is_dirty = False
+        self._game_is_dirty = False
 
     async def save(self, force: bool = False) -> None:
-        # TODO check usage of game
-        # if self.game is not None:
-        await self.game_ctx.save_game(game=self._game)
+        game_changed = self._game_is_dirty or (self._game is not None and self._game.is_dirty)
+
+        await self.game_ctx.save(
+            state=self._state,
+            game=self._game,
+            save_state=self._state_is_dirty or force,
+            save_game=game_changed or force,
+        )
 
-        if self._state_is_dirty or force:
-            await self.game_ctx.set_state(state=self._state)
+        if self._game is not None:
+            self._game.mark_clean()
 
         self._state_is_dirty = False
+        self._game_is_dirty = False
 
     def rollback_state(self) -> None:
         self._state = self._last_state
@@ -322,8 +395,10 @@ class GameCtxProxy:
 
     @game.setter
     def game(self, value: BlackJackGame) -> None:
+        self._game_is_dirty = True
         self._game = value
 
     @game.deleter
     def game(self) -> None:
+        self._game_is_dirty = True
         self._game = None
@@ -2,6 +2,7 @@ import json
 from abc import ABCMeta, abstractmethod
 from enum import Enum
 from typing import Optional
+from urllib.parse import quote_plus
 
 
 class ButtonColor(str, Enum):
@@ -40,18 +41,33 @@ class TextButton(AbstractButton):
 
 
 class Keyboard:
+    """
+    The keyboard is serialized when it is created and again after every change,
+    the JSON, its url-encoded form and its VKScript literal are reused by every message.
+    """
+
+    __slots__ = ('_buttons', '_one_time', '_inline', '_serialized', '_encoded', '_script')
+
     def __init__(self, one_time: bool = True, inline: bool = False,
                  buttons: Optional[list[list[AbstractButton]]] = None) -> None:
         self._buttons = [] if buttons is None else buttons
         self._one_time = one_time
         self._inline = inline
+        self._serialize()
 
     def add_line(self) -> None:
         if self._buttons[-1]:
             self._buttons.append([])
+            self._serialize()
 
     def add_button(self, btn: AbstractButton) -> None:
         self._buttons[-1].append(btn)
+        self._serialize()
+
+    def _serialize(self) -> None:
+        self._serialized = json.dumps(self.to_dict(), ensure_ascii=False, separators=(',', ':'))
+        self._encoded = quote_plus(self._serialized)
+        self._script = json.dumps(self._serialized, ensure_ascii=False)
 
     def to_dict(self) -> dict:
         return {
@@ -61,7 +77,17 @@ class Keyboard:
         }
 
     def serialize(self) -> str:
-        return json.dumps(self.to_dict())
+        return self._serialized
+
+    @property
+    def encoded(self) -> str:
+        """Url-encoded JSON"""
+        return self._encoded
+
+    @property
+    def script(self) -> str:
+        """JSON as a VKScript string literal"""
+        return self._script
 
 
 class Keyboards:
@@ -1,7 +1,7 @@
 from datetime import datetime, timedelta as td
 from typing import TYPE_CHECKING
 
-from app.api.players.models import PlayerModel, PlayerStats
+from app.api.players.models import PlayerModel, PlayerGameResult
 from app.game.game import GameCtxProxy, BlackJackGame
 from app.game.keyboards import Keyboards as Kbds, Keyboard
 from app.game.player import Player
@@ -28,20 +28,10 @@ async def handle_balance(ctx: GameCtxProxy, access: 'GAccessors') -> None:
 
 
 async def handle_statistic(ctx: GameCtxProxy, access: 'GAccessors') -> None:
-    limit, offset = 10, 0
-    order_by, order_type = 'cash', -1
+    players = await access.players.get_top_players(ctx.chat_id, limit=10)
 
-    players = await access.players.get_players_list(
-        vk_id=None,
-        chat_id=ctx.chat_id,
-        offset=offset,
-        limit=limit,
-        order_by=order_by,
-        order_type=order_type
-    )
-
-    text = 'Топ 10 игроков чата:%0A%0A'
-    text += '%0A'.join(f'{idx + 1}) {p}' for idx, p in enumerate(players))
+    text = 'Топ 10 игроков чата:\n\n'
+    text += '\n'.join(f'{idx + 1}) {p}' for idx, p in enumerate(players))
 
     await send(ctx, access, text, Kbds.START)
     ctx.state = States.WAITING_FOR_START_CHOICE
@@ -50,8 +40,8 @@ async def handle_statistic(ctx: GameCtxProxy, access: 'GAccessors') -> None:
 async def personal_player_statistic(ctx: GameCtxProxy, access: 'GAccessors', p: PlayerModel) -> str:
     pos = await access.players.get_player_position(ctx.chat_id, p.cash, 'cash')
     return f'''
-    Статистика для [id{p.vk_id}|{p.first_name} {p.last_name}]%0A%0A%0A
-    Позиция в рейтинге: {pos}%0A%0A
+    Статистика для [id{p.vk_id}|{p.first_name} {p.last_name}]\n\n\n
+    Позиция в рейтинге: {pos}\n\n
     {p.stats}
     '''
 
@@ -69,14 +59,14 @@ async def handle_bonus(ctx: GameCtxProxy, access: 'GAccessors') -> None:
     created, player = await fetch_user_info(ctx, access, sets.start_cash)
 
     if created:
-        answer = f'''А вы у нас впервые, поэтому мы Вам начисляем {sets.start_cash}$%0A
+        answer = f'''А вы у нас впервые, поэтому мы Вам начисляем {sets.start_cash}$\n
         Следующий бонус будет доступен через {pretty_time_delta(td(minutes=sets.bonus_period))}'''
     elif player.check_bonus(sets.bonus_period):
-        answer = f'''Вы получаете ежедневный бонус: {sets.bonus}$%0A
+        answer = f'''Вы получаете ежедневный бонус: {sets.bonus}$\n
         Следующий бонус будет доступен через {pretty_time_delta(td(minutes=sets.bonus_period))}'''
         await access.players.give_bonus(ctx.chat_id, player.vk_id, player.cash + sets.bonus)
     else:
-        answer = f'''К сожалению бонус еще не доступен :(%0A
+        answer = f'''К сожалению бонус еще не доступен :(\n
         Ближайший бонус будет доступен через {pretty_time_delta(player.td_to_bonus(sets.bonus_period))}'''
 
     await send(ctx, access, answer, Kbds.START)
@@ -87,30 +77,30 @@ async def fetch_user_info(ctx: GameCtxProxy, access: 'GAccessors', start_cash: f
     :return: (flag, PlayerModel). Flag is True if new players was created
     """
 
-    flag = False
-    db_user_data = await access.players.get_player_by_vk_id(chat_id=ctx.chat_id, vk_id=ctx.msg.from_id)
-    if db_user_data is None:
-        flag = True
-        vk_user_data = (await access.vk.get_users([ctx.msg.from_id]))[0]
-        await access.players.add_player(
-            vk_id=vk_user_data.vk_id,
-            chat_id=ctx.chat_id,
-            first_name=vk_user_data.first_name,
-            last_name=vk_user_data.last_name,
-            birthday=vk_user_data.birthday,
-            city=vk_user_data.city,
-            start_cash=start_cash,
-        )
+    player = await access.players.get_player_by_vk_id(chat_id=ctx.chat_id, vk_id=ctx.msg.from_id)
+    if player is not None:
+        return False, player
 
-    return flag, await access.players.get_player_by_vk_id(chat_id=ctx.chat_id, vk_id=ctx.msg.from_id)
+    vk_user_data = (await access.vk.get_users([ctx.msg.from_id]))[0]
+    player = await access.players.add_player(
+        vk_id=vk_user_data.vk_id,
+        chat_id=ctx.chat_id,
+        first_name=vk_user_data.first_name,
+        last_name=vk_user_data.last_name,
+        birthday=vk_user_data.birthday,
+        city=vk_user_data.city,
+        start_cash=start_cash,
+    )
+
+    return True, player
 
 
 async def complete_registration(ctx: GameCtxProxy, access: 'GAccessors') -> None:
     answer = f'''
-    Все игроки зарегистрированы. %0A
-    Укажите сумму ставки без пробелов.%0A%0A
-    Правила ставок:%0A{ctx.game.min_max_bet_info}%0A
-    Ваши счета: %0A{ctx.game.players_cashes_info}
+    Все игроки зарегистрированы. \n
+    Укажите сумму ставки без пробелов.\n\n
+    Правила ставок:\n{ctx.game.min_max_bet_info}\n
+    Ваши счета: \n{ctx.game.players_cashes_info}
     '''
     await send(ctx, access, answer, Kbds.GET_OUT)
     ctx.state = States.WAITING_FOR_BETS
@@ -123,20 +113,13 @@ async def complete_betting(ctx: GameCtxProxy, access: 'GAccessors'):
 
 async def hand_out_cards(ctx: GameCtxProxy, access: 'GAccessors'):
     g = ctx.game
-    # TODO get_card
-
-    try:
-        g.deal_cards()
-    except IndexError as e:
-        await do_end(ctx, access)
-        await send(ctx, access, 'Колода закончилась! Данная игра не может быть продолжена', Kbds.START)
-        ctx.state = States.WAITING_FOR_START_CHOICE
-    else:
-        txt = f'%0A%0A'.join([f'◾ {p}, вот твои карты:%0A{p.cards_info}' for p in g.players_and_dealer])
-        await send(ctx, access, txt)
+    g.deal_cards()
+
+    txt = f'\n\n'.join([f'◾ {p}, вот твои карты:\n{p.cards_info}' for p in g.players_and_dealer])
+    await send(ctx, access, txt)
 
     # for player in ctx.game.players_and_dealer:
-    #     await send(ctx, access, f'{player}%0A{player.cards}')
+    #     await send(ctx, access, f'{player}\n{player.cards}')
     # await send(ctx, access, f'{player}', photos=player.cards_photos)
 
 
@@ -145,7 +128,7 @@ async def bj_ask_player(ctx: GameCtxProxy, access: 'GAccessors') -> None:
 
     ctx.game.handle_player_blackjack(player)
 
-    answer = f'{player}, У тебя блэкджек!%0A'
+    answer = f'{player}, У тебя блэкджек!\n'
 
     if player.status_is_bj_need_to_clarify:
         answer += 'Выбирай'
@@ -177,7 +160,7 @@ async def base_ask_player(ctx: GameCtxProxy, access: 'GAccessors'):
 
 async def handle_bj_pick_up11_action(ctx: GameCtxProxy, access: 'GAccessors', player: Player) -> bool:
     player.set_bj_win11_status()
-    answer = f'{player}%0A, забирай 1:1!'
+    answer = f'{player}\n, забирай 1:1!'
     await send(ctx, access, answer)
     return True
 
@@ -194,17 +177,10 @@ async def handle_bj_wait_action(ctx: GameCtxProxy, access: 'GAccessors', player:
 
 
 async def handle_hit_action(ctx: GameCtxProxy, access: 'GAccessors', player: Player) -> bool:
-    # TODO get_card
-    try:
-        player.add_card(ctx.game.deck.get_card())
-    except IndexError as e:
-        await do_end(ctx, access)
-        await send(ctx, access, 'Колода закончилась! Данная игра не может быть продолжена', Kbds.START)
-        ctx.state = States.WAITING_FOR_START_CHOICE
-    else:
-        answer = f'{player}%0A{player.cards_info}'
-        await send(ctx, access, answer)
-        return player.not_bust
+    player.add_card(ctx.game.draw_card())
+    answer = f'{player}\n{player.cards_info}'
+    await send(ctx, access, answer)
+    return player.not_bust
 
 
 async def handle_player_bust(ctx: GameCtxProxy, access: 'GAccessors', player: Player) -> bool:
@@ -229,18 +205,11 @@ async def dispatch(ctx: GameCtxProxy, access: 'GAccessors', player: Player, choi
     if ctx.game.next_player():
         await ask_player(ctx, access)
     else:
-        # TODO get_card
-        try:
-            ctx.game.handle_dealer()
-        except IndexError as e:
-            await do_end(ctx, access)
-            await send(ctx, access, 'Колода закончилась! Данная игра не может быть продолжена', Kbds.START)
-            ctx.state = States.WAITING_FOR_START_CHOICE
-        else:
-            await handle_results(ctx, access)
-            await show_results(ctx, access)
-            await update_players_data(ctx, access)
-            ctx.state = States.WAITING_FOR_LAST_CHOICE
+        ctx.game.handle_dealer()
+        await handle_results(ctx, access)
+        await show_results(ctx, access)
+        await update_players_data(ctx, access)
+        ctx.state = States.WAITING_FOR_LAST_CHOICE
 
 
 async def handle_results(ctx: GameCtxProxy, access: 'GAccessors'):
@@ -250,14 +219,15 @@ async def handle_results(ctx: GameCtxProxy, access: 'GAccessors'):
 async def show_results(ctx: GameCtxProxy, access: 'GAccessors'):
     game = ctx.game
     d = game.dealer
-    answer = f'◾ {d}%0A{d.cards_info}%0A%0AСумма очков: {d.score}'
+    answer = f'◾ {d}\n{d.cards_info}\n\nСумма очков: {d.score}'
     if d.has_blackjack:
         answer += '(Блэк-джек)'
     await send(ctx, access, answer)
 
+    results = '\n'.join([f'🔺 {p} - {p.status.value} (Счет: {p.cash})' for p in game.players])
     answer = f'''
-    Результаты игры:%0A
-    {'%0A'.join([f'🔺 {p} - {p.status.value} (Счет: {p.cash})' for p in game.players])} 
+    Результаты игры:\n
+    {results} 
     '''
     await send(ctx, access, answer, Kbds.REPEAT_GAME_QUESTION)
 
@@ -270,6 +240,7 @@ async def init_game(ctx: GameCtxProxy, access: 'GAccessors', num_of_players: int
         min_bet=sets.min_bet,
         max_bet=sets.max_bet,
         decks_qty=sets.num_of_decks,
+        penetration=sets.penetration,
     )
 
 
@@ -292,9 +263,9 @@ async def place_bet(ctx: GameCtxProxy, access: 'GAccessors', player: Player) ->
     elif bet > player.cash:
         answer = f'{player}, на счете недостаточно денег, дружище. На счете: {player.cash}'
     elif bet > ctx.game.max_bet:
-        answer = f'{player}, ты превысил максимальную ставку стола%0A{ctx.game.min_max_bet_info}'
+        answer = f'{player}, ты превысил максимальную ставку стола\n{ctx.game.min_max_bet_info}'
     elif bet < ctx.game.min_bet:
-        answer = f'{player}, твоя ставка ниже минимальной ставки стола%0A{ctx.game.min_max_bet_info}'
+        answer = f'{player}, твоя ставка ниже минимальной ставки стола\n{ctx.game.min_max_bet_info}'
     else:
         answer = f'{player}, ваша ставка принята! Сумма ставки: {bet}'
         player.place_bet(bet)
@@ -303,12 +274,16 @@ async def place_bet(ctx: GameCtxProxy, access: 'GAccessors', player: Player) ->
 
 
 async def repeat_game(ctx: GameCtxProxy, access: 'GAccessors') -> None:
-    answer = f'''Круто, играем снова! Укажите сумму ставки без пробелов.%0A%0A
-                Ваши счета: %0A{ctx.game.players_cashes_info}
+    reshuffled = ctx.game.reset()
+
+    answer = f'''Круто, играем снова! Укажите сумму ставки без пробелов.\n\n
+                Ваши счета: \n{ctx.game.players_cashes_info}
                 '''
+    if reshuffled:
+        answer += '\nДошли до подрезной карты, колода перемешана.'
+
     await send(ctx, access, answer, Kbds.GET_OUT)
 
-    ctx.game.reset()
     ctx.state = States.WAITING_FOR_BETS
 
 
@@ -318,29 +293,17 @@ async def end_game(ctx: GameCtxProxy, access: 'GAccessors') -> None:
     await do_end(ctx, access)
 
 
-async def calculate_stats(ctx: GameCtxProxy, access: 'GAccessors', player: Player) -> PlayerStats:
-    p = await access.players.get_player_by_vk_id(chat_id=ctx.chat_id, vk_id=player.vk_id)
-    st = p.stats
-    st.max_cash = max(st.max_cash, player.cash)
-    st.number_of_games += 1
-
-    if player.is_winner:
-        st.number_of_wins += 1
-        st.max_win = player.calc_win() if st.max_win is None else max(st.max_win, player.calc_win())
-    elif player.is_loser:
-        st.number_of_defeats += 1
-
-    st.max_bet = player.bet if st.max_bet is None else max(st.max_bet, player.bet)
-    st.average_bet = player.bet if st.average_bet is None \
-        else (st.average_bet * (st.number_of_games - 1) + player.bet) / st.number_of_games
-
-    return st
-
-
 async def update_players_data(ctx: GameCtxProxy, access: 'GAccessors') -> None:
-    for player in ctx.game.players:
-        new_stats = await calculate_stats(ctx, access, player)
-        await access.players.update_after_game(ctx.chat_id, player.vk_id, player.cash, new_stats)
+    await access.players.update_after_game(ctx.chat_id, [
+        PlayerGameResult(
+            vk_id=player.vk_id,
+            cash=player.cash,
+            bet=player.bet,
+            win=player.calc_win(),
+            is_winner=player.is_winner,
+            is_loser=player.is_loser,
+        ) for player in ctx.game.players
+    ])
 
 
 async def do_force_cancel(ctx: GameCtxProxy, access: 'GAccessors') -> None:
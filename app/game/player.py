@@ -1,7 +1,8 @@
 from enum import Enum
 from typing import Optional
 
-from app.game.deck import Card
+from app.game.deck import Card, card_value, card_text
+from app.game.tracking import Trackable
 
 
 class PlayerStatus(str, Enum):
@@ -16,7 +17,7 @@ class PlayerStatus(str, Enum):
     BJ_WAITING_FOR_END = 'Блэк-джек (ожидает конца игры)'
 
 
-class Player:
+class Player(Trackable):
     def __init__(self,
                  name: Optional[str] = None,
                  vk_id: Optional[int] = None,
@@ -30,7 +31,7 @@ class Player:
             self._vk_id = vk_id
             self._cash = cash
             self._bet: Optional[float] = None
-            self._cards: list[Card] = []
+            self._cards = bytearray()
             self._score: int = 0
             self._status = PlayerStatus.IN_GAME
 
@@ -39,7 +40,7 @@ class Player:
         self._vk_id = raw['vk_id']
         self._cash = raw['cash']
         self._bet = raw['bet']
-        self._cards = [Card(d=card_info) for card_info in raw['cards']]
+        self._cards = bytearray(raw['cards'])
         self._score = raw['score']
         self._status = PlayerStatus(raw['status'])
 
@@ -49,7 +50,7 @@ class Player:
             'vk_id': self.vk_id,
             'bet': self.bet,
             'cash': self.cash,
-            'cards': [c.to_dict() for c in self._cards],
+            'cards': bytes(self._cards),
             'score': self.score,
             'status': self._status
         }
@@ -66,7 +67,7 @@ class Player:
 
     def update_cash(self) -> None:
         if self._status is not PlayerStatus.IN_GAME:
-            self._cash += self.calc_win()
+            self.cash += self.calc_win()
 
     @property
     def result_defined(self):
@@ -122,6 +123,10 @@ class Player:
 
         return self._score >= 10 and self.cards_qty == 1
 
+    @property
+    def cards(self) -> bytes:
+        return bytes(self._cards)
+
     @property
     def cards_qty(self) -> int:
         return len(self._cards)
@@ -133,6 +138,7 @@ class Player:
     @status.setter
     def status(self, value: PlayerStatus) -> None:
         self._status = value
+        self.mark_dirty()
 
     @property
     def is_dealer(self) -> bool:
@@ -145,6 +151,7 @@ class Player:
     @cash.setter
     def cash(self, value: float) -> None:
         self._cash = value
+        self.mark_dirty()
 
     def reset(self) -> None:
         self._bet = None
@@ -168,37 +175,37 @@ class Player:
         )
 
     def set_in_game_status(self) -> None:
-        self._status = PlayerStatus.IN_GAME
+        self.status = PlayerStatus.IN_GAME
 
     def set_bust_status(self):
-        self._status = PlayerStatus.BUST
+        self.status = PlayerStatus.BUST
         self.update_cash()
 
     def set_win_status(self) -> None:
-        self._status = PlayerStatus.WIN
+        self.status = PlayerStatus.WIN
         self.update_cash()
 
     def set_draw_status(self) -> None:
-        self._status = PlayerStatus.DRAW
+        self.status = PlayerStatus.DRAW
         self.update_cash()
 
     def set_defeat_status(self) -> None:
-        self._status = PlayerStatus.DEFEAT
+        self.status = PlayerStatus.DEFEAT
         self.update_cash()
 
     def set_bj_win11_status(self) -> None:
-        self._status = PlayerStatus.BJ_WIN11
+        self.status = PlayerStatus.BJ_WIN11
         self.update_cash()
 
     def set_bj_win32_status(self) -> None:
-        self._status = PlayerStatus.BJ_WIN32
+        self.status = PlayerStatus.BJ_WIN32
         self.update_cash()
 
     def set_bj_waiting_for_end_status(self) -> None:
-        self._status = PlayerStatus.BJ_WAITING_FOR_END
+        self.status = PlayerStatus.BJ_WAITING_FOR_END
 
     def set_bj_need_to_clarify_status(self) -> None:
-        self._status = PlayerStatus.BJ_NEED_TO_CLARIFY
+        self.status = PlayerStatus.BJ_NEED_TO_CLARIFY
 
     @property
     def not_bust(self) -> bool:
@@ -206,7 +213,8 @@ class Player:
 
     def add_card(self, card: Card) -> None:
         self._cards.append(card)
-        self._score += card.bj_value(self._score)
+        self._score += card_value(card, self._score)
+        self.mark_dirty()
 
     # @property
     # def cards_photos(self) -> str:
@@ -220,13 +228,14 @@ class Player:
     # deprecated
     @property
     def cards_info(self) -> str:
-        ans = '%0A'.join([c.card_txt for c in self._cards])
+        ans = '\n'.join([card_text(c) for c in self._cards])
         # if self.is_dealer and len(self._cards) == 1:
-        #     ans += f'%0A{Card.fake_card()}'
+        #     ans += f'\n{Card.fake_card()}'
         return ans
 
     def place_bet(self, value: int) -> None:
         self._bet = value
+        self.mark_dirty()
 
     @property
     def score(self) -> int:
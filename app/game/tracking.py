@@ -0,0 +1,14 @@
+class Trackable:
+    """Remembers whether the object was changed since it was loaded or saved"""
+
+    _dirty: bool = False
+
+    @property
+    def is_dirty(self) -> bool:
+        return self._dirty
+
+    def mark_dirty(self) -> None:
+        self._dirty = True
+
+    def mark_clean(self) -> None:
+        self._dirty = False
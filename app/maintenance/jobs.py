@@ -0,0 +1,56 @@
+import asyncio
+from typing import AsyncIterator, Awaitable, Callable
+
+from app.config import setup_config
+from app.databases import setup_databases
+from app.store import setup_store, Store
+
+from app.app_logger import get_logger
+
+logger = get_logger(__file__)
+
+Job = Callable[[Store], Awaitable[None]]
+
+
+async def rebuild_leaderboards(store: Store) -> None:
+    await store.players.rebuild_leaderboards()
+
+
+async def rebuild_chat_summaries(store: Store) -> None:
+    await store.players.rebuild_chat_summaries()
+
+
+async def fill_total_bets(store: Store) -> None:
+    await store.players.fill_total_bets()
+
+
+def import_players(path: str) -> Job:
+    async def _lines() -> AsyncIterator[str]:
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                yield line
+
+    async def import_players(store: Store) -> None:
+        result = await store.players.import_players(_lines())
+        logger.info(f'Imported from {path}: {result.to_dict()}')
+
+    return import_players
+
+
+async def _run_job(config_path: str, job: Job) -> None:
+    config = setup_config(config_path)
+    databases = setup_databases(config)
+    store = setup_store(databases, config)
+
+    await databases.connect_for_maintenance()
+    try:
+        await job(store)
+    finally:
+        await databases.disconnect_for_maintenance()
+
+
+def run_job(config_path: str, job: Job) -> None:
+    """One-off job against the databases, the accessors are not connected"""
+    logger.info(f'Job {job.__name__} started')
+    asyncio.run(_run_job(config_path, job))
+    logger.info(f'Job {job.__name__} finished')
@@ -2,7 +2,7 @@ import asyncio
 from asyncio import Task
 from typing import Optional
 
-from app.config import setup_config, Config
+from app.config import setup_config, Config, PollerConfig
 from app.databases import setup_databases, Databases
 from app.store import Store, setup_store, VkApiAccessor
 from app.store.rabbit.accessor import RabbitAccessor
@@ -20,6 +20,13 @@ class Poller:
 
         self.is_running = False
         self.poll_task: Optional[Task] = None
+        self.publish_task: Optional[Task] = None
+        self.queue: asyncio.Queue[tuple[str, list[dict]]] = asyncio.Queue(maxsize=self.cfg.queue_size)
+        self.published_ts: Optional[str] = None
+
+    @property
+    def cfg(self) -> PollerConfig:
+        return self.config.poller
 
     @property
     def rabbit(self) -> RabbitAccessor:
@@ -36,27 +43,86 @@ class Poller:
         await self.store.connect_for_poller()
 
         self.is_running = True
+        self.publish_task = asyncio.create_task(self.publish())
         self.poll_task = asyncio.create_task(self.poll())
 
     async def stop(self):
         logger.info('Poller stopping ...')
-        await self.store.disconnect_for_poller()
-        await self.databases.disconnect_for_poller()
 
         if self.poll_task and self.is_running:
             self.is_running = False
             self.poll_task.cancel()
+            await asyncio.gather(self.poll_task, return_exceptions=True)
+
+        if self.publish_task:
+            try:
+                await asyncio.wait_for(self.queue.join(), self.cfg.shutdown_timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f'Poller stopped with {self.queue.qsize()} batches not published')
+            self.publish_task.cancel()
+            await asyncio.gather(self.publish_task, return_exceptions=True)
+
+        if self.published_ts is not None:
+            self.vk_api.commit_ts(self.published_ts, force_sync=True)
+
+        await self.store.disconnect_for_poller()
+        await self.databases.disconnect_for_poller()
 
         logger.info('Poller stopped')
 
     async def poll(self):
+        """
+        The next long poll request is sent as soon as the previous one returns,
+        publishing is done by the publish task. When the queue is full polling waits for it.
+        """
         logger.info('Poller started')
+        retry_delay = 1
 
         while self.is_running:
-            updates = await self.store.vk_api.poll()
+            try:
+                updates = await self.store.vk_api.poll()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.exception(f'Exception during polling, retry in {retry_delay}s: {e}')
+                await asyncio.sleep(retry_delay)
+                retry_delay = min(retry_delay * 2, 30)
+                continue
+
+            retry_delay = 1
             logger.info(f'Updates: {updates}')
-            if updates:
-                await self.rabbit.send_message(updates)
+            # empty polls are queued too: the checkpoint moves only after the earlier batches are published
+            await self.queue.put((self.vk_api.ts, updates))
+
+    async def publish(self):
+        while True:
+            ts, updates = await self.queue.get()
+            # batches polled while the previous publish was in progress are sent together
+            batches = 1
+            while not self.queue.empty():
+                ts, more = self.queue.get_nowait()
+                updates += more
+                batches += 1
+
+            # nothing is dropped: polling stops when the queue is full while publishing is retried
+            retry_delay = 1
+            while updates:
+                try:
+                    await self.rabbit.send_updates(updates)
+                    break
+                except Exception as e:
+                    logger.exception(f'Exception during publishing updates, retry in {retry_delay}s: {e}')
+                    await asyncio.sleep(retry_delay)
+                    retry_delay = min(retry_delay * 2, 30)
+
+            self.published_ts = ts
+            try:
+                self.vk_api.commit_ts(ts)
+            except OSError as e:
+                logger.exception(f'Exception during saving ts checkpoint: {e}')
+
+            for _ in range(batches):
+                self.queue.task_done()
 
 
 def setup_poller(config_path: str) -> Poller:
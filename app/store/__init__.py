@@ -33,7 +33,7 @@ class Store:
 
     @property
     def api_accessors(self) -> tuple:
-        return self.admins, self.players
+        return self.admins, self.players, self.game_settings
 
     async def connect_for_poller(self) -> None:
         for accessor in self.poller_accessors:
@@ -1,26 +1,37 @@
-import json
 from typing import Union, Optional
 
 from app.base.base_game_accessor import BaseGameAccessor
 from app.config import Config
 from app.databases import Databases
 from app.databases.redis import Redis
+from app.game.codec import decode_game, encode_game
 from app.game.states import State
 from aioredis import client
 
-STATE_PREFIX = 'STATE_'
-DATA_PREFIX = 'DATA_'
+GAME_PREFIX = 'GAME_'
+STATE_FIELD = 'state'
+DATA_FIELD = 'data'
+UPDATE_PREFIX = 'UPD_'
 
+# keys of the games stored before the hash, migrated on the first read
+LEGACY_STATE_PREFIX = 'STATE_'
+LEGACY_DATA_PREFIX = 'DATA_'
 
-def state_key(chat: int) -> str:
-    return STATE_PREFIX + str(chat)
 
+def game_key(chat: int) -> str:
+    return GAME_PREFIX + str(chat)
 
-def data_key(chat: int) -> str:
-    return DATA_PREFIX + str(chat)
+
+def legacy_keys(chat: int) -> tuple[str, str]:
+    return LEGACY_STATE_PREFIX + str(chat), LEGACY_DATA_PREFIX + str(chat)
 
 
 class RedisGameAccessor(BaseGameAccessor):
+    """
+    State and data of a chat are two fields of one hash, so both are read and written in one round trip.
+    Data is an opaque binary blob (see app.game.codec)
+    """
+
     def __init__(self, databases: Databases, config: Config) -> None:
         super().__init__(databases, config)
 
@@ -30,31 +41,101 @@ class RedisGameAccessor(BaseGameAccessor):
 
     @property
     def client(self) -> client.Redis:
-        return self.redis.client
+        return self.redis.bin_client
+
+    async def get_ctx(self, chat: int) -> tuple[Optional[int], Optional[bytes]]:
+        """The legacy keys are read in the same round trip; a chat found only there is migrated"""
+        async with self.client.pipeline(transaction=False) as pipe:
+            (state, data), (legacy_state, legacy_data) = await pipe.hmget(
+                game_key(chat), STATE_FIELD, DATA_FIELD).mget(*legacy_keys(chat)).execute()
+
+        if state is None and data is None and (legacy_state is not None or legacy_data is not None):
+            state, data = await self._migrate(chat, legacy_state, legacy_data)
+
+        return None if state is None else int(state), data
+
+    async def _migrate(self,
+                       chat: int,
+                       state: Optional[bytes],
+                       data: Optional[bytes],
+                       ) -> tuple[Optional[bytes], Optional[bytes]]:
+        """Moves a game stored as STATE_/DATA_ keys (data is JSON) into the hash and deletes the keys"""
+        if data is not None:
+            data = encode_game(decode_game(data))
+
+        to_set = {field: value for field, value in ((STATE_FIELD, state), (DATA_FIELD, data)) if value is not None}
+        async with self.client.pipeline(transaction=True) as pipe:
+            await pipe.hset(game_key(chat), mapping=to_set).delete(*legacy_keys(chat)).execute()
+
+        return state, data
+
+    async def set_ctx(self,
+                      chat: int,
+                      state: Optional[int],
+                      data: Optional[bytes],
+                      update_state: bool = True,
+                      update_data: bool = True,
+                      ) -> None:
+
+        to_set, to_delete = {}, []
+
+        if update_state:
+            if state is None:
+                to_delete.append(STATE_FIELD)
+            else:
+                to_set[STATE_FIELD] = state
+
+        if update_data:
+            if data is None:
+                to_delete.append(DATA_FIELD)
+            else:
+                to_set[DATA_FIELD] = data
+
+        key = game_key(chat)
+
+        if to_set and to_delete:
+            async with self.client.pipeline(transaction=True) as pipe:
+                await pipe.hset(key, mapping=to_set).hdel(key, *to_delete).execute()
+        elif to_set:
+            await self.client.hset(key, mapping=to_set)
+        elif to_delete:
+            await self.client.hdel(key, *to_delete)
+
+    async def updates_handled(self, keys: list[str]) -> list[bool]:
+        async with self.client.pipeline(transaction=False) as pipe:
+            for key in keys:
+                pipe.exists(UPDATE_PREFIX + key)
+            return [bool(res) for res in await pipe.execute()]
+
+    async def mark_updates_handled(self, keys: list[str], ttl: int) -> None:
+        async with self.client.pipeline(transaction=False) as pipe:
+            for key in keys:
+                pipe.set(UPDATE_PREFIX + key, 1, ex=ttl)
+            await pipe.execute()
 
     async def set_state(self, chat: int, state: Union[State, int]) -> None:
         if isinstance(state, State):
             state = state.state_id
 
-        await self.client.set(state_key(chat), state)
+        await self.client.hset(game_key(chat), STATE_FIELD, state)
 
     async def get_state(self, chat: int, default: Optional[int] = None) -> Optional[int]:
-        result = await self.client.get(state_key(chat))
+        result = await self.client.hget(game_key(chat), STATE_FIELD)
         return default if result is None else int(result)
 
-    async def set_data(self, chat: int, data: dict) -> None:
-        await self.client.set(data_key(chat), json.dumps(data))
+    async def set_data(self, chat: int, data: bytes) -> None:
+        await self.client.hset(game_key(chat), DATA_FIELD, data)
 
-    async def get_data(self, chat: int, default: Optional[dict] = None) -> Optional[dict]:
-        if (data_json := await self.client.get(data_key(chat))) is not None:
-            return json.loads(data_json)
+    async def get_data(self, chat: int, default: Optional[bytes] = None) -> Optional[bytes]:
+        if (data := await self.client.hget(game_key(chat), DATA_FIELD)) is not None:
+            return data
         return default
 
-    async def update_data(self, chat: int, data: dict) -> None:
+    async def update_data(self, chat: int, data: bytes) -> None:
         pass
 
     async def reset_data(self, chat: int) -> None:
-        await self.client.delete(data_key(chat))
+        await self.client.hdel(game_key(chat), DATA_FIELD)
 
     async def reset_state(self, chat: int) -> None:
-        await self.client.delete(state_key(chat))
+        await self.client.hdel(game_key(chat), STATE_FIELD)
@@ -1,3 +1,4 @@
+import time
 from typing import Optional
 
 from motor.motor_asyncio import AsyncIOMotorCollection
@@ -6,22 +7,36 @@ from pymongo.errors import DuplicateKeyError
 from app.api.game_settings.models import GameSettingsModel
 from app.base.mongo_accessor import MongoAccessor
 from app.config import GameConfig, Config
-from app.databases import Databases
+from app.databases import Databases, Redis
 from app.app_logger import get_logger
 
 logger = get_logger(__file__)
 
 
 class GameSettingsAccessor(MongoAccessor):
+    """
+    Settings are read on almost every message, so they are cached in the process.
+    The cache lives settings_cache_ttl seconds and is dropped by every process
+    as soon as the settings are patched (the patching process publishes to CHANGES_CHANNEL).
+    """
+
     _DEFAULT_ID = 0
+    CHANGES_CHANNEL = 'game_settings_changes'
 
     def __init__(self, databases: Databases, config: Config) -> None:
         super().__init__(databases, config)
+        self._cached: Optional[GameSettingsModel] = None
+        self._cached_at = 0.0
+        self._generation = 0
 
     @property
     def coll(self) -> AsyncIOMotorCollection:
         return self.mongo.collects.game_settings
 
+    @property
+    def redis(self) -> Redis:
+        return self.databases.redis
+
     @property
     def cfg(self) -> GameConfig:
         return self.config.game
@@ -35,10 +50,12 @@ class GameSettingsAccessor(MongoAccessor):
             bonus=self.cfg.bonus,
             bonus_period=self.cfg.bonus_period,
             num_of_decks=self.cfg.num_of_decks,
+            penetration=self.cfg.penetration,
         )
+        self.redis.subscribe(self.CHANGES_CHANNEL, lambda _: self.invalidate())
 
     async def install(self, min_bet: float, max_bet: float, start_cash: float, bonus: float,
-                      num_of_decks: int, bonus_period) -> None:
+                      num_of_decks: int, bonus_period, penetration: float) -> None:
 
         model = GameSettingsModel(
             _id=self._DEFAULT_ID,
@@ -48,6 +65,7 @@ class GameSettingsAccessor(MongoAccessor):
             bonus=bonus,
             num_of_decks=num_of_decks,
             bonus_period=bonus_period,
+            penetration=penetration,
         )
 
         try:
@@ -56,9 +74,25 @@ class GameSettingsAccessor(MongoAccessor):
             pass
 
     async def get(self, _id: int) -> Optional[GameSettingsModel]:
+        if self._cached is not None and time.monotonic() - self._cached_at < self.cfg.settings_cache_ttl:
+            return self._cached
+
         _id = self._DEFAULT_ID
+        generation = self._generation
         raw = await self.coll.find_one({'_id': _id})
-        return GameSettingsModel.from_dict(raw) if raw else None
+        settings = GameSettingsModel.from_dict(raw) if raw else None
+
+        # not cached if the settings were changed while they were being read
+        if generation == self._generation:
+            self._cached, self._cached_at = settings, time.monotonic()
+
+        return settings
 
     async def patch(self, _id: int, data: dict) -> None:
         await self.coll.update_one({'_id': _id}, {'$set': data})
+        self.invalidate()
+        await self.redis.publish(self.CHANGES_CHANNEL, str(_id))
+
+    def invalidate(self) -> None:
+        self._cached = None
+        self._generation += 1
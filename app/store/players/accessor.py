@@ -1,59 +1,170 @@
 from datetime import datetime
-from typing import Optional, Any
+from typing import Any, AsyncIterable, Optional, Union
 
-from motor.motor_asyncio import AsyncIOMotorCollection
-from pymongo import ASCENDING, DESCENDING
+from motor.motor_asyncio import AsyncIOMotorCollection, AsyncIOMotorCursor
+from pymongo import ASCENDING, ReturnDocument, UpdateOne
 from pymongo.errors import DuplicateKeyError
 
 from app.api.chats.models import ChatModel
-from app.api.players.models import PlayerModel, PlayerStats
+from app.api.players.models import PlayerModel, PlayerStats, PlayerGameResult
 from app.base.mongo_accessor import MongoAccessor
-from app.config import Config
-from app.databases import Databases
-from app.store.players.pipelines import group_by_chat_pipeline, chat_pagination_pipeline, match_pipeline
+from app.base.ttl_cache import TTLCache
+from app.config import Config, GameConfig
+from app.databases import Databases, Redis
+from app.store.players.importer import ImportResult, PlayersImporter
+from app.store.players.indexes import CHATS_INDEXES, PLAYERS_INDEXES, ensure_indexes, verify_queries
+from app.store.players.leaderboard import Leaderboard
+from app.store.players.pagination import after_filter, decode_after, encode_after, keyset_sort
+from app.store.players.pipelines import chat_summaries_pipeline
+from app.store.players.summaries import ChatSummaries
 from app.app_logger import get_logger
 
 logger = get_logger(__file__)
 
+EXPORT_BATCH_SIZE = 2000
+
 
 class PlayersAccessor(MongoAccessor):
+    """
+    Players are cached by (chat_id, vk_id). The bot changes them through this accessor only,
+    so the cache is written through. Changes made by the admin API are published to CHANGES_CHANNEL
+    and every process drops the changed player.
+
+    The accessor also maintains the chats collection: a summary per chat
+    (number of players, the richest players, last activity) read by the admin API.
+    The summaries are written in the background, see ChatSummaries.
+    """
+
+    CHANGES_CHANNEL = 'players_changes'
+    ALL_CHANGED = '*'
+
     def __init__(self, databases: Databases, config: Config) -> None:
         super().__init__(databases, config)
+        self.cache: TTLCache[PlayerModel] = TTLCache(self.cfg.players_cache_size, self.cfg.players_cache_ttl)
+        self.leaderboard = Leaderboard(databases.redis)
+        self.summaries = ChatSummaries(self, self.cfg.chat_summary_interval)
 
     @property
     def coll(self) -> AsyncIOMotorCollection:
         return self.mongo.collects.players
 
+    @property
+    def chats(self) -> AsyncIOMotorCollection:
+        return self.mongo.collects.chats
+
+    @property
+    def redis(self) -> Redis:
+        return self.databases.redis
+
+    @property
+    def cfg(self) -> GameConfig:
+        return self.config.game
+
     async def connect(self) -> None:
         logger.info('Player accessor connected')
-        try:
-            await self.coll.create_index([('chat_id', ASCENDING), ('vk_id', ASCENDING)], unique=True)
-            await self.coll.create_index([('chat_id', ASCENDING)])
-            await self.coll.create_index([('cash', DESCENDING)])
-        except:
-            logger.info('Indexes for player collection have already created')
+        await ensure_indexes(self.coll, PLAYERS_INDEXES)
+        await verify_queries(self.coll, PLAYERS_INDEXES)
+        await ensure_indexes(self.chats, CHATS_INDEXES)
+        await verify_queries(self.chats, CHATS_INDEXES)
+
+        if not await self.chats.estimated_document_count() and await self.coll.estimated_document_count():
+            await self.rebuild_chat_summaries()
+
+        self.redis.subscribe(self.CHANGES_CHANNEL, self._on_change)
+        self.summaries.start()
+
+    async def disconnect(self) -> None:
+        logger.info('Player accessor disconnected')
+        await self.summaries.stop()
+
+    def _on_change(self, message: Optional[str]) -> None:
+        if message is None or message == self.ALL_CHANGED:
+            self.cache.clear()
         else:
-            logger.info('Indexes for player collection created')
+            chat_id, vk_id = map(int, message.split(':'))
+            self.cache.pop((chat_id, vk_id))
+
+    async def fill_total_bets(self) -> None:
+        """
+        Players saved before stats.total_bet existed get it from their average bet.
+        The filter is not indexed, so it is run once as a maintenance job rather than at every start.
+        """
+        result = await self.coll.update_many(
+            {'stats.total_bet': None},
+            [{
+                '$set': {
+                    'stats.total_bet': {
+                        '$multiply': [{'$ifNull': ['$stats.average_bet', 0]}, '$stats.number_of_games']
+                    }
+                }
+            }]
+        )
+
+        if result.modified_count:
+            logger.info(f'stats.total_bet filled for {result.modified_count} players')
 
     async def get_chat_by_id(self, chat_id: int) -> Optional[ChatModel]:
-        pipeline = match_pipeline('chat_id', chat_id) + group_by_chat_pipeline()
-        result = await self.coll.aggregate(pipeline).to_list(None)
-        return ChatModel.from_dict(result[0]) if result else None
+        raw_chat = await self.chats.find_one({'chat_id': chat_id})
+        return ChatModel.from_dict(raw_chat) if raw_chat else None
+
+    async def rebuild_chat_summaries(self) -> None:
+        # $merge needs the unique index on chat_id
+        await ensure_indexes(self.chats, CHATS_INDEXES)
+        await self.coll.aggregate(chat_summaries_pipeline(self.chats.name), allowDiskUse=True).to_list(None)
+        logger.info(f'Summaries of {await self.chats.count_documents({})} chats rebuilt')
 
     async def get_player_by_vk_id(self, vk_id: int, chat_id: int) -> Optional[PlayerModel]:
-        # request = {'vk_id': vk_id} if chat_id is None else {'chat_id': chat_id, 'vk_id': vk_id}
+        player = self.cache.get((chat_id, vk_id))
+        if player is not None:
+            return player
+
         raw_player = await self.coll.find_one({'chat_id': chat_id, 'vk_id': vk_id})
-        return PlayerModel.from_dict(raw_player) if raw_player else None
+        if raw_player is None:
+            return None
+
+        player = PlayerModel.from_dict(raw_player)
+        self.cache.set((chat_id, vk_id), player)
+        return player
+
+    @staticmethod
+    async def _keyset_page(coll: AsyncIOMotorCollection,
+                           filter_: dict,
+                           key_field: str,
+                           offset: int,
+                           limit: int,
+                           order_by: str,
+                           order_type: int,
+                           after: Optional[str]) -> tuple[list[dict], Optional[str]]:
+        """
+        With `after` the page starts right after the item the token was made for, so any page costs
+        as much as the first one. Without it the page is skipped to by offset.
+        :return: (raw items, token of the next page or None if this page is the last one)
+        """
+        if after is not None:
+            value, key = decode_after(after, order_by, order_type)
+            filter_ = {'$and': [filter_, after_filter(order_by, value, key_field, key, order_type)]}
+            offset = 0
+
+        cursor = coll.find(filter_).sort(keyset_sort(order_by, key_field, order_type)).skip(offset).limit(limit)
+        items = await cursor.to_list(None)
+
+        next_after = None
+        if len(items) == limit:
+            next_after = encode_after(order_by, order_type, items[-1].get(order_by), items[-1][key_field])
+
+        return items, next_after
 
     async def get_chats_list(self,
                              offset: int,
                              limit: int,
                              order_by: Optional[str],
-                             order_type: int) -> list[ChatModel]:
+                             order_type: int,
+                             after: Optional[str] = None,
+                             ) -> tuple[list[ChatModel], Optional[str]]:
 
-        pipeline = group_by_chat_pipeline() + chat_pagination_pipeline(offset, limit, order_by, order_type)
-        result = await self.coll.aggregate(pipeline).to_list(None)
-        return [ChatModel.from_dict(chat_raw) for chat_raw in result]
+        chats, next_after = await self._keyset_page(
+            self.chats, {}, 'chat_id', offset, limit, order_by or 'chat_id', order_type, after)
+        return [ChatModel.from_dict(chat_raw) for chat_raw in chats], next_after
 
     async def get_players_list(self,
                                offset: int,
@@ -62,7 +173,8 @@ class PlayersAccessor(MongoAccessor):
                                order_type: int,
                                vk_id: Optional[int] = None,
                                chat_id: Optional[int] = None,
-                               ) -> list[PlayerModel]:
+                               after: Optional[str] = None,
+                               ) -> tuple[list[PlayerModel], Optional[str]]:
 
         filter_ = {}
 
@@ -72,37 +184,166 @@ class PlayersAccessor(MongoAccessor):
         if chat_id is not None:
             filter_['chat_id'] = chat_id
 
-        cursor = self.coll.find(filter_).sort(order_by, order_type).skip(offset).limit(limit)
-        return [PlayerModel.from_dict(p_raw) for p_raw in await cursor.to_list(None)]
+        players, next_after = await self._keyset_page(
+            self.coll, filter_, '_id', offset, limit, order_by, order_type, after)
+        return [PlayerModel.from_dict(p_raw) for p_raw in players], next_after
+
+    async def import_players(self, lines: AsyncIterable[Union[str, bytes]]) -> ImportResult:
+        """
+        Upserts players from NDJSON lines, then rebuilds everything derived from the players.
+        The rebuild is done even if the import fails halfway: a part of the players may have been written.
+        """
+        # the upserts look players up by (chat_id, vk_id): without the index every one of them scans the collection
+        await ensure_indexes(self.coll, PLAYERS_INDEXES)
+
+        try:
+            return await PlayersImporter(self).run(lines)
+        finally:
+            self.cache.clear()
+            await self.redis.publish(self.CHANGES_CHANNEL, self.ALL_CHANGED)
+            await self.rebuild_leaderboards()
+            await self.rebuild_chat_summaries()
+
+    def export_players(self, chat_id: Optional[int] = None) -> AsyncIOMotorCursor:
+        """Raw players without _id, fetched from the server by EXPORT_BATCH_SIZE"""
+        filter_ = {} if chat_id is None else {'chat_id': chat_id}
+        return self.coll.find(filter_, {'_id': 0}, batch_size=EXPORT_BATCH_SIZE)
+
+    async def get_top_players(self, chat_id: int, limit: int) -> list[PlayerModel]:
+        """The richest players of the chat from the leaderboard"""
+        if not await self.leaderboard.exists(chat_id):
+            await self.rebuild_leaderboard(chat_id)
+
+        vk_ids = await self.leaderboard.top(chat_id, limit)
+        players = {vk_id: self.cache.get((chat_id, vk_id)) for vk_id in vk_ids}
+
+        missed = [vk_id for vk_id, player in players.items() if player is None]
+        if missed:
+            async for raw_player in self.coll.find({'chat_id': chat_id, 'vk_id': {'$in': missed}}):
+                players[raw_player['vk_id']] = PlayerModel.from_dict(raw_player)
+
+        return [players[vk_id] for vk_id in vk_ids if players[vk_id] is not None]
+
+    async def rebuild_leaderboard(self, chat_id: int) -> None:
+        cursor = self.coll.find({'chat_id': chat_id}, {'_id': 0, 'vk_id': 1, 'cash': 1})
+        await self.leaderboard.replace(chat_id, {p['vk_id']: p['cash'] async for p in cursor})
+
+    async def rebuild_leaderboards(self) -> None:
+        """Rebuilds the leaderboards of all the chats from Mongo"""
+        chat_id, cash, chats = None, {}, 0
+
+        cursor = self.coll.find({}, {'_id': 0, 'chat_id': 1, 'vk_id': 1, 'cash': 1}).sort('chat_id', ASCENDING)
+        async for raw in cursor:
+            if raw['chat_id'] != chat_id:
+                if chat_id is not None:
+                    await self.leaderboard.replace(chat_id, cash)
+                    chats += 1
+                chat_id, cash = raw['chat_id'], {}
+
+            cash[raw['vk_id']] = raw['cash']
+
+        if chat_id is not None:
+            await self.leaderboard.replace(chat_id, cash)
+            chats += 1
+
+        logger.info(f'Leaderboards of {chats} chats rebuilt')
 
     async def patch(self, chat_id: int, vk_id: int, data: dict) -> None:
         await self.coll.update_one({'chat_id': chat_id, 'vk_id': vk_id}, {'$set': data})
+        self.cache.pop((chat_id, vk_id))
+        if 'cash' in data:
+            await self.leaderboard.set_cash(chat_id, {vk_id: data['cash']})
+            self.summaries.touch(chat_id, activity=False)
+        await self.redis.publish(self.CHANGES_CHANNEL, f'{chat_id}:{vk_id}')
 
     async def update_cash(self, chat_id: int, vk_id: int, new_cash: float) -> None:
         await self.patch(chat_id, vk_id, {'cash': new_cash})
 
     async def get_player_position(self, chat_id: int, value: Any, field: str = 'cash') -> Optional[int]:
+        if field == 'cash':
+            if not await self.leaderboard.exists(chat_id):
+                await self.rebuild_leaderboard(chat_id)
+            return await self.leaderboard.position(chat_id, value)
+
         return await self.coll.count_documents({'$and': [{'chat_id': chat_id}, {field: {'$gt': value}}]}) + 1
 
-    async def update_after_game(self,
-                                chat_id: int,
-                                vk_id: int,
-                                new_cash: float,
-                                new_stats: PlayerStats,
-                                ) -> None:
+    async def update_after_game(self, chat_id: int, results: list[PlayerGameResult]) -> None:
+        """Settles a round in one round trip, the stats are changed atomically on the server"""
+        if not results:
+            return
+
+        await self.coll.bulk_write([
+            UpdateOne({'chat_id': chat_id, 'vk_id': r.vk_id}, self._after_game_update(r)) for r in results
+        ], ordered=False)
+        await self.leaderboard.add_cash(chat_id, {r.vk_id: r.win for r in results})
+        self.summaries.touch(chat_id)
+
+        for r in results:
+            player = self.cache.get((chat_id, r.vk_id))
+            if player is not None:
+                self._apply_game_result(player, r)
+
+    @staticmethod
+    def _after_game_update(result: PlayerGameResult) -> dict:
+        """
+        The bet is not taken from the cash when it is placed, so the win (negative for a lost bet)
+        is the whole change of the cash. It is added rather than set, a bonus given during the round is kept.
+        """
+        max_fields = {
+            'stats.max_cash': result.cash,
+            'stats.max_bet': result.bet,
+        }
 
-        await self.patch(chat_id, vk_id, {'cash': new_cash, 'stats': new_stats.to_dict()})
+        if result.is_winner:
+            max_fields['stats.max_win'] = result.win
 
-    async def give_bonus(self, chat_id: int, vk_id: int, new_cash: float) -> None:
-        await self.coll.update_one(
+        return {
+            '$inc': {
+                'cash': result.win,
+                'stats.number_of_games': 1,
+                'stats.number_of_wins': int(result.is_winner),
+                'stats.number_of_defeats': int(result.is_loser),
+                'stats.total_bet': result.bet,
+            },
+            '$max': max_fields,
+        }
+
+    @staticmethod
+    def _apply_game_result(player: PlayerModel, result: PlayerGameResult) -> None:
+        """The same changes as _after_game_update makes in the database"""
+        stats = player.stats
+        player.cash += result.win
+
+        stats.number_of_games += 1
+        stats.number_of_wins += int(result.is_winner)
+        stats.number_of_defeats += int(result.is_loser)
+        stats.total_bet = (stats.total_bet or 0) + result.bet
+        stats.average_bet = stats.total_bet / stats.number_of_games
+        stats.max_cash = max(stats.max_cash, result.cash)
+        stats.max_bet = result.bet if stats.max_bet is None else max(stats.max_bet, result.bet)
+        if result.is_winner:
+            stats.max_win = result.win if stats.max_win is None else max(stats.max_win, result.win)
+
+    async def give_bonus(self, chat_id: int, vk_id: int, new_cash: float) -> Optional[PlayerModel]:
+        raw_player = await self.coll.find_one_and_update(
             {'chat_id': chat_id, 'vk_id': vk_id},
             {
                 '$set': {
                     'last_bonus_date': datetime.utcnow(),
                     'cash': new_cash
                 }
-            }
+            },
+            return_document=ReturnDocument.AFTER,
         )
+        if raw_player is None:
+            self.cache.pop((chat_id, vk_id))
+            return None
+
+        player = PlayerModel.from_dict(raw_player)
+        self.cache.set((chat_id, vk_id), player)
+        await self.leaderboard.set_cash(chat_id, {vk_id: new_cash})
+        self.summaries.touch(chat_id)
+        return player
 
     async def add_player(self,
                          chat_id: int,
@@ -112,21 +353,29 @@ class PlayersAccessor(MongoAccessor):
                          birthday: Optional[datetime],
                          start_cash: float,
                          city: Optional[str],
-                         ) -> None:
+                         ) -> PlayerModel:
+        """Returns the existing player if it was already added"""
+        raw_player = {
+            'vk_id': vk_id,
+            'chat_id': chat_id,
+            'first_name': first_name,
+            'last_name': last_name,
+            'registered_at': datetime.utcnow(),
+            'last_bonus_date': datetime.utcnow(),
+            'birthday': birthday,
+            'city': city,
+            'cash': start_cash,
+            'stats': PlayerStats(max_cash=start_cash, total_bet=0).to_dict()
+        }
 
         try:
-            await self.coll.insert_one({
-                'vk_id': vk_id,
-                'chat_id': chat_id,
-                'first_name': first_name,
-                'last_name': last_name,
-                'registered_at': datetime.utcnow(),
-                'last_bonus_date': datetime.utcnow(),
-                'birthday': birthday,
-                'city': city,
-                'cash': start_cash,
-                'stats': PlayerStats(max_cash=start_cash).to_dict()
-            })
-
+            await self.coll.insert_one(raw_player)
         except DuplicateKeyError:
-            pass
+            self.cache.pop((chat_id, vk_id))
+            return await self.get_player_by_vk_id(vk_id=vk_id, chat_id=chat_id)
+
+        player = PlayerModel.from_dict(raw_player)
+        self.cache.set((chat_id, vk_id), player)
+        await self.leaderboard.set_cash(chat_id, {vk_id: start_cash})
+        self.summaries.touch(chat_id, new_players=1)
+        return player
@@ -0,0 +1,117 @@
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, AsyncIterable, Optional, Union
+
+from bson import json_util
+from pymongo import UpdateOne
+
+from app.api.players.models import PlayerModel
+
+from app.app_logger import get_logger
+
+if TYPE_CHECKING:
+    from app.store.players.accessor import PlayersAccessor
+
+logger = get_logger(__file__)
+
+IMPORT_CHUNK = 5000
+
+
+@dataclass
+class ImportResult:
+    lines: int = 0
+    upserted: int = 0
+    modified: int = 0
+    invalid: int = 0
+
+    def to_dict(self) -> dict:
+        return {
+            'lines': self.lines,
+            'upserted': self.upserted,
+            'modified': self.modified,
+            'invalid': self.invalid,
+        }
+
+
+def parse_player(line: Union[str, bytes]) -> Optional[dict]:
+    """
+    A line of players.json (extended JSON, see datagen.py) as the document to store.
+    None for an empty line; raises on a broken one
+    """
+    if isinstance(line, bytes):
+        line = line.decode()
+    if not line.strip():
+        return None
+
+    raw = json_util.loads(line)
+    stats = raw['stats']
+    if stats.get('total_bet') is None:
+        stats['total_bet'] = (stats.get('average_bet') or 0) * stats['number_of_games']
+
+    # from_dict checks the fields are there, to_dict drops the unknown ones
+    return PlayerModel.from_dict(raw).to_dict()
+
+
+class PlayersImporter:
+    """
+    Upserts players from NDJSON by (chat_id, vk_id). The lines are parsed in chunks,
+    a chunk is written with one unordered bulk_write while the next one is being parsed.
+    """
+
+    def __init__(self, accessor: 'PlayersAccessor', chunk_size: int = IMPORT_CHUNK) -> None:
+        self.accessor = accessor
+        self.chunk_size = chunk_size
+
+    async def run(self, lines: AsyncIterable[Union[str, bytes]]) -> ImportResult:
+        result = ImportResult()
+        started_at = time.monotonic()
+        chunk: list[UpdateOne] = []
+        writing: Optional[asyncio.Task] = None
+
+        try:
+            async for line in lines:
+                result.lines += 1
+                try:
+                    doc = parse_player(line)
+                except Exception as e:
+                    result.invalid += 1
+                    logger.warning(f'Line {result.lines} is skipped: {e!r}')
+                    continue
+
+                if doc is None:
+                    continue
+
+                chunk.append(UpdateOne({'chat_id': doc['chat_id'], 'vk_id': doc['vk_id']}, {'$set': doc}, upsert=True))
+                if len(chunk) == self.chunk_size:
+                    await self._wait(writing, result, started_at)
+                    writing = asyncio.create_task(self._write(chunk))
+                    chunk = []
+        except BaseException:
+            # the chunk sent to the server is let finish, so the data rebuilt after the import includes it
+            if writing is not None and not writing.done():
+                await asyncio.gather(writing, return_exceptions=True)
+            raise
+
+        await self._wait(writing, result, started_at)
+        if chunk:
+            await self._wait(asyncio.create_task(self._write(chunk)), result, started_at)
+
+        return result
+
+    async def _write(self, chunk: list[UpdateOne]) -> tuple[int, int]:
+        bulk = await self.accessor.coll.bulk_write(chunk, ordered=False)
+        return bulk.upserted_count, bulk.modified_count
+
+    @staticmethod
+    async def _wait(writing: Optional[asyncio.Task], result: ImportResult, started_at: float) -> None:
+        if writing is None:
+            return
+
+        upserted, modified = await writing
+        result.upserted += upserted
+        result.modified += modified
+
+        elapsed = time.monotonic() - started_at
+        logger.info(f'Import: {result.lines} lines read, {result.upserted} players added, '
+                    f'{result.modified} updated, {result.invalid} invalid ({result.lines / elapsed:.0f} lines/s)')
@@ -0,0 +1,117 @@
+from dataclasses import dataclass, field
+from typing import Optional
+
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+from app.app_logger import get_logger
+
+logger = get_logger(__file__)
+
+# stages of a winning plan that mean the query is not served by an index
+BAD_STAGES = ('COLLSCAN', 'SORT')
+
+
+@dataclass
+class QueryShape:
+    """A query the accessor makes, with sample values: only the shape matters for the plan"""
+    name: str
+    filter: dict
+    sort: Optional[list[tuple[str, int]]] = None
+    limit: int = 0
+
+
+@dataclass
+class CollectionIndexes:
+    indexes: list[IndexModel]
+    queries: list[QueryShape] = field(default_factory=list)
+    obsolete: list[str] = field(default_factory=list)
+
+
+PLAYERS_INDEXES = CollectionIndexes(
+    indexes=[
+        IndexModel([('chat_id', ASCENDING), ('vk_id', ASCENDING)], name='chat_id_1_vk_id_1', unique=True),
+        # _id is the tie breaker of the keyset pagination
+        IndexModel([('chat_id', ASCENDING), ('cash', DESCENDING), ('_id', DESCENDING)], name='chat_id_1_cash_-1__id_-1'),
+        IndexModel([('vk_id', ASCENDING), ('cash', DESCENDING), ('_id', DESCENDING)], name='vk_id_1_cash_-1__id_-1'),
+        IndexModel([('cash', DESCENDING), ('_id', DESCENDING)], name='cash_-1__id_-1'),
+    ],
+    queries=[
+        QueryShape('player by chat and vk_id', {'chat_id': 0, 'vk_id': 0}),
+        QueryShape('players of chat', {'chat_id': 0}, sort=[('chat_id', ASCENDING)]),
+        QueryShape('top players of chat', {'chat_id': 0}, sort=[('cash', DESCENDING)], limit=5),
+        QueryShape('player position in chat', {'chat_id': 0, 'cash': {'$gt': 0}}),
+        QueryShape('page of chat', {'chat_id': 0}, sort=[('cash', DESCENDING), ('_id', DESCENDING)], limit=10),
+        QueryShape('next page of chat', {'$and': [{'chat_id': 0}, {'$or': [
+            {'cash': {'$lt': 0}}, {'cash': 0, '_id': {'$lt': 0}}, {'cash': None}]}]}, sort=[
+            ('cash', DESCENDING), ('_id', DESCENDING)], limit=10),
+        QueryShape('page of player in all chats', {'vk_id': 0}, sort=[('cash', DESCENDING), ('_id', DESCENDING)],
+                   limit=10),
+        QueryShape('page of players', {}, sort=[('cash', DESCENDING), ('_id', DESCENDING)], limit=10),
+    ],
+    # the prefix of chat_id_1_vk_id_1 serves the same queries; the others are replaced by the ones with _id
+    obsolete=['chat_id_1', 'chat_id_1_cash_-1', 'vk_id_1_cash_-1', 'cash_-1'],
+)
+
+
+CHATS_INDEXES = CollectionIndexes(
+    indexes=[
+        IndexModel([('chat_id', ASCENDING)], name='chat_id_1', unique=True),
+        IndexModel([('number_of_players', ASCENDING), ('chat_id', ASCENDING)], name='number_of_players_1_chat_id_1'),
+    ],
+    queries=[
+        QueryShape('chat by id', {'chat_id': 0}),
+        QueryShape('chats by id', {}, sort=[('chat_id', ASCENDING)], limit=5),
+        QueryShape('chats by players', {}, sort=[('number_of_players', DESCENDING), ('chat_id', DESCENDING)], limit=5),
+        QueryShape('next chats by players', {'$or': [
+            {'number_of_players': {'$lt': 0}}, {'number_of_players': 0, 'chat_id': {'$lt': 0}},
+            {'number_of_players': None}]}, sort=[('number_of_players', DESCENDING), ('chat_id', DESCENDING)], limit=5),
+    ],
+)
+
+
+async def ensure_indexes(coll: AsyncIOMotorCollection, spec: CollectionIndexes) -> None:
+    existing = await coll.index_information()
+
+    for name in spec.obsolete:
+        if name in existing:
+            await coll.drop_index(name)
+            logger.info(f'Index {coll.name}.{name} dropped')
+
+    missing = [index for index in spec.indexes if index.document['name'] not in existing]
+    if missing:
+        await coll.create_indexes(missing)
+        logger.info(f'Indexes {coll.name}.{[index.document["name"] for index in missing]} created')
+
+
+def _plan_stages(plan: dict) -> list[str]:
+    stages = [plan['stage']] if 'stage' in plan else []
+
+    for key in ('inputStage', 'queryPlan'):
+        if key in plan:
+            stages += _plan_stages(plan[key])
+    for key in ('inputStages', 'shards'):
+        for sub_plan in plan.get(key, []):
+            stages += _plan_stages(sub_plan.get('winningPlan', sub_plan))
+
+    return stages
+
+
+async def verify_queries(coll: AsyncIOMotorCollection, spec: CollectionIndexes) -> list[str]:
+    """Explains every query shape, warns about the ones scanning the collection or sorting in memory"""
+    bad = []
+
+    for query in spec.queries:
+        cursor = coll.find(query.filter)
+        if query.sort:
+            cursor = cursor.sort(query.sort)
+        if query.limit:
+            cursor = cursor.limit(query.limit)
+
+        plan = (await cursor.explain())['queryPlanner']['winningPlan']
+        stages = _plan_stages(plan)
+        if any(stage in BAD_STAGES for stage in stages):
+            logger.warning(f'Query "{query.name}" on {coll.name} is not served by an index: {" <- ".join(stages)}')
+            bad.append(query.name)
+
+    return bad
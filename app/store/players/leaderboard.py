@@ -0,0 +1,84 @@
+from aioredis import client
+
+from app.databases import Redis
+
+LEADERBOARD_PREFIX = 'LB_'
+ZADD_CHUNK = 1000
+
+_ZADD_IF_EXISTS = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    return redis.call('ZADD', KEYS[1], unpack(ARGV))
+end
+return 0
+"""
+
+_ZINCRBY_IF_EXISTS = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    for i = 1, #ARGV, 2 do
+        redis.call('ZINCRBY', KEYS[1], ARGV[i], ARGV[i + 1])
+    end
+end
+return 0
+"""
+
+
+def leaderboard_key(chat_id: int) -> str:
+    return LEADERBOARD_PREFIX + str(chat_id)
+
+
+class Leaderboard:
+    """
+    Cash of the players of a chat in a sorted set: vk_id -> cash.
+    Mongo stays the source of truth, the sets can be rebuilt from it at any time.
+    """
+
+    def __init__(self, redis: Redis) -> None:
+        self.redis = redis
+
+    @property
+    def client(self) -> client.Redis:
+        return self.redis.client
+
+    async def exists(self, chat_id: int) -> bool:
+        return bool(await self.client.exists(leaderboard_key(chat_id)))
+
+    async def set_cash(self, chat_id: int, cash: dict[int, float]) -> None:
+        """
+        cash: vk_id -> cash. A set that does not exist is not created: it would hold only these players,
+        the readers build the missing sets from Mongo.
+        """
+        if cash:
+            args = [v for vk_id, value in cash.items() for v in (value, vk_id)]
+            await self.client.eval(_ZADD_IF_EXISTS, 1, leaderboard_key(chat_id), *args)
+
+    async def add_cash(self, chat_id: int, deltas: dict[int, float]) -> None:
+        """deltas: vk_id -> change of the cash. Like set_cash, a set that does not exist is not created"""
+        if deltas:
+            args = [v for vk_id, delta in deltas.items() for v in (delta, vk_id)]
+            await self.client.eval(_ZINCRBY_IF_EXISTS, 1, leaderboard_key(chat_id), *args)
+
+    async def top(self, chat_id: int, limit: int, offset: int = 0) -> list[int]:
+        """vk_ids, the richest first"""
+        return [int(vk_id) for vk_id in await self.client.zrevrange(leaderboard_key(chat_id), offset, offset + limit - 1)]
+
+    async def position(self, chat_id: int, cash: float) -> int:
+        """1 + number of players having more cash, players with equal cash share the position"""
+        return await self.client.zcount(leaderboard_key(chat_id), f'({cash}', '+inf') + 1
+
+    async def replace(self, chat_id: int, cash: dict[int, float]) -> None:
+        """The set is built aside and renamed, so readers never see it half filled"""
+        key = leaderboard_key(chat_id)
+        tmp_key = key + ':rebuild'
+        items = list(cash.items())
+
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.delete(tmp_key)
+            for start in range(0, len(items), ZADD_CHUNK):
+                pipe.zadd(tmp_key, mapping=dict(items[start:start + ZADD_CHUNK]))
+
+            if items:
+                pipe.rename(tmp_key, key)
+            else:
+                pipe.delete(key)
+
+            await pipe.execute()
@@ -0,0 +1,62 @@
+import base64
+import binascii
+from typing import Any
+
+from bson import json_util
+
+
+def encode_after(order_by: str, order_type: int, value: Any, key: Any) -> str:
+    """
+    Opaque token of the last item of a page: the order of the page, the sort value of the item
+    and its unique key
+    """
+    return base64.urlsafe_b64encode(json_util.dumps([order_by, order_type, value, key]).encode()).decode()
+
+
+def decode_after(token: str, order_by: str, order_type: int) -> tuple[Any, Any]:
+    """
+    :return: (value, key) of the item the token was made for
+    :raise ValueError: the token was not made by encode_after or was made for another order
+    """
+    try:
+        payload = json_util.loads(base64.urlsafe_b64decode(token.encode()))
+    except (binascii.Error, UnicodeDecodeError, TypeError) as e:
+        raise ValueError(f'Bad token: {token}') from e
+
+    if not isinstance(payload, list) or len(payload) != 4:
+        raise ValueError(f'Bad token: {token}')
+
+    token_order_by, token_order_type, value, key = payload
+    if token_order_by != order_by or token_order_type != order_type:
+        raise ValueError(f'Token of another order: {token_order_by} {token_order_type}')
+
+    return value, key
+
+
+def keyset_sort(field: str, key_field: str, order_type: int) -> list[tuple[str, int]]:
+    if field == key_field:
+        return [(key_field, order_type)]
+
+    return [(field, order_type), (key_field, order_type)]
+
+
+def after_filter(field: str, value: Any, key_field: str, key: Any, order_type: int) -> dict:
+    """
+    Items following (value, key) in keyset_sort order.
+    Nulls are the smallest values in Mongo: they go first in ascending order and last in descending.
+    """
+    op = '$gt' if order_type == 1 else '$lt'
+
+    if field == key_field:
+        return {key_field: {op: key}}
+
+    if value is None:
+        conditions = [{field: None, key_field: {op: key}}]
+        if order_type == 1:
+            conditions.append({field: {'$ne': None}})
+    else:
+        conditions = [{field: {op: value}}, {field: value, key_field: {op: key}}]
+        if order_type == -1:
+            conditions.append({field: None})
+
+    return {'$or': conditions}
@@ -1,42 +1,29 @@
-from typing import Optional, Any
+CHAT_TOP_PLAYERS = 5
 
 
-def match_pipeline(field: str, value: Any) -> list[dict]:
-    return [{'$match': {field: value}}]
-
-
-def group_by_chat_pipeline(max_players: int = 5) -> list[dict]:
+def chat_summaries_pipeline(chats_collection: str) -> list[dict]:
+    """
+    Builds the summaries of all the chats from the players and merges them into chats_collection.
+    $topN keeps only CHAT_TOP_PLAYERS players per chat while grouping (MongoDB 5.2+).
+    """
     return [
+        {'$unset': '_id'},
         {
             '$group': {
                 '_id': '$chat_id',
-                'players': {'$push': '$$ROOT'}
-            }
-        },
-        {
-            '$addFields': {
-                'number_of_players': {'$size': '$players'}
+                'players': {'$topN': {'n': CHAT_TOP_PLAYERS, 'sortBy': {'cash': -1}, 'output': '$$ROOT'}},
+                'number_of_players': {'$sum': 1},
+                'last_activity': {'$max': '$last_bonus_date'},
             }
         },
         {
             '$project': {
                 '_id': 0,
                 'chat_id': '$_id',
-                'players': {'$slice': ['$players', max_players]},
+                'players': 1,
                 'number_of_players': 1,
+                'last_activity': 1,
             }
         },
+        {'$merge': {'into': chats_collection, 'on': 'chat_id', 'whenMatched': 'replace', 'whenNotMatched': 'insert'}},
     ]
-
-
-def chat_pagination_pipeline(offset: int, limit: int, order_by: Optional[str], order_type: int) -> list[dict]:
-    pipeline = [
-        {'$sort': {order_by: order_type}},
-        {'$skip': offset},
-        {'$limit': limit},
-    ]
-
-    if pipeline[0]['$sort'].get('chat_id') is None:
-        pipeline[0]['$sort']['chat_id'] = 1
-
-    return pipeline
@@ -0,0 +1,94 @@
+import asyncio
+from asyncio import Task
+from dataclasses import dataclass
+from datetime import datetime
+from typing import TYPE_CHECKING, Optional
+
+from pymongo import UpdateOne
+
+from app.store.players.pipelines import CHAT_TOP_PLAYERS
+
+from app.app_logger import get_logger
+
+if TYPE_CHECKING:
+    from app.store.players.accessor import PlayersAccessor
+
+logger = get_logger(__file__)
+
+
+@dataclass
+class SummaryChange:
+    new_players: int = 0
+    last_activity: Optional[datetime] = None
+
+    def merge(self, other: 'SummaryChange') -> None:
+        self.new_players += other.new_players
+        if other.last_activity is not None:
+            self.last_activity = max(self.last_activity or other.last_activity, other.last_activity)
+
+
+class ChatSummaries:
+    """
+    Changes of the chats are collected in memory and written by a background task every `interval` seconds
+    in one bulk_write, so settling a round costs no requests for the summaries.
+    The richest players are taken from the leaderboard when the change is written: every process writes
+    the same top, and the number of players and the last activity are changed by $inc and $max.
+    """
+
+    def __init__(self, accessor: 'PlayersAccessor', interval: float) -> None:
+        self.accessor = accessor
+        self.interval = interval
+        self._changes: dict[int, SummaryChange] = {}
+        self._task: Optional[Task] = None
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+        await self.flush()
+
+    def touch(self, chat_id: int, new_players: int = 0, activity: bool = True) -> None:
+        change = self._changes.setdefault(chat_id, SummaryChange())
+        change.new_players += new_players
+        if activity:
+            change.last_activity = datetime.utcnow()
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.exception(f'Exception during writing chat summaries: {e}')
+
+    async def flush(self) -> None:
+        """On a failure the changes are kept for the next attempt"""
+        if not self._changes:
+            return
+
+        changes, self._changes = self._changes, {}
+        try:
+            requests = [UpdateOne({'chat_id': chat_id}, await self._update(chat_id, change), upsert=True)
+                        for chat_id, change in changes.items()]
+            await self.accessor.chats.bulk_write(requests, ordered=False)
+        except BaseException:
+            for chat_id, change in changes.items():
+                self._changes.setdefault(chat_id, SummaryChange()).merge(change)
+            raise
+
+    async def _update(self, chat_id: int, change: SummaryChange) -> dict:
+        top = await self.accessor.get_top_players(chat_id, CHAT_TOP_PLAYERS)
+        update = {
+            '$set': {'players': [p.to_dict() for p in top]},
+            '$inc': {'number_of_players': change.new_players},
+        }
+
+        if change.last_activity is not None:
+            update['$max'] = {'last_activity': change.last_activity}
+
+        return update
@@ -1,33 +1,40 @@
+import asyncio
+import json
+
 from aio_pika import Channel, Message, DeliveryMode, Exchange
 
 from app.base.base_accessor import BaseAccessor
 from app.config import RabbitConfig, Config
 from app.databases import Databases
 from app.databases.rabbit import Rabbit
+from app.store.rabbit.utils import split_by_partition
 from app.app_logger import get_logger
 
 logger = get_logger(__file__)
 
 
 class RabbitAccessor(BaseAccessor):
+    """
+    Messages are published at least once: every message waits for the broker confirm,
+    up to publish_window messages wait at the same time. Failed messages are republished
+    (on a new channel if the old one is closed), the error is raised when the retries are over.
+    """
+
     def __init__(self, databases: Databases, config: Config) -> None:
         super().__init__(databases, config)
+        self._window = asyncio.Semaphore(self.cfg.publish_window)
 
     @property
     def rabbit(self) -> Rabbit:
         return self.databases.rabbit
 
-    @property
-    def queue_name(self) -> str:
-        return self.cfg.queue_name
-
     @property
     def channel(self) -> Channel:
         return self.rabbit.channel
 
     @property
     def exchange(self) -> Exchange:
-        return self.rabbit.channel.default_exchange
+        return self.rabbit.exchange
 
     @property
     def cfg(self) -> RabbitConfig:
@@ -39,14 +46,38 @@ class RabbitAccessor(BaseAccessor):
     async def disconnect(self) -> None:
         logger.info('Rabbit accessor disconnected')
 
-    async def send_message(self, message_body: str) -> None:
-        try:
+    async def send_updates(self, updates: list[dict]) -> None:
+        """Updates of one chat always go to the same partition, so only one worker handles the chat"""
+        await self.publish([
+            (json.dumps(part, ensure_ascii=False, separators=(',', ':')).encode(), partition)
+            for partition, part in split_by_partition(updates, self.cfg.partitions).items()
+        ])
+
+    async def publish(self, messages: list[tuple[bytes, int]]) -> None:
+        """Publishes (body, partition) pairs at once and waits for all the confirms together"""
+        pending = messages
+
+        for attempt in range(self.cfg.publish_retries + 1):
+            results = await asyncio.gather(*(self._publish_one(*m) for m in pending), return_exceptions=True)
+            failed = [(m, res) for m, res in zip(pending, results) if isinstance(res, Exception)]
+            if not failed:
+                return
+
+            pending = [m for m, _ in failed]
+            logger.warning(f'{len(failed)} messages are not confirmed (attempt {attempt + 1}): {failed[0][1]!r}')
+
+            if attempt < self.cfg.publish_retries:
+                await asyncio.sleep(min(0.5 * 2 ** attempt, 5))
+                try:
+                    await self.rabbit.reopen_channel()
+                except Exception as e:
+                    logger.exception(f'Exception during reopening channel: {e}')
+
+        raise failed[0][1]
+
+    async def _publish_one(self, body: bytes, partition: int) -> None:
+        async with self._window:
             await self.exchange.publish(
-                Message(
-                    message_body.encode(),
-                    delivery_mode=DeliveryMode.PERSISTENT,
-                ),
-                routing_key=self.queue_name
+                Message(body, delivery_mode=DeliveryMode.PERSISTENT),
+                routing_key=str(partition),
             )
-        except Exception as e:
-            logger.exception(f'Exception during send message to queue: {e}')
@@ -0,0 +1,34 @@
+from app.store.vk_api.dataclasses import UpdateMessage
+
+
+def jump_hash(key: int, buckets: int) -> int:
+    """
+    Jump consistent hash (Lamping, Veach). When the number of buckets changes
+    from N to N+1 only 1/(N+1) of the keys move to another bucket.
+    """
+    bucket, j = -1, 0
+    key &= 0xFFFFFFFFFFFFFFFF
+
+    while j < buckets:
+        bucket = j
+        key = (key * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+        j = int((bucket + 1) * ((1 << 31) / ((key >> 33) + 1)))
+
+    return bucket
+
+
+def split_by_partition(updates: list[dict], partitions: int) -> dict[int, list[list]]:
+    """
+    Only message_new updates are routed: the worker ignores the rest.
+    The messages are packed (see UpdateMessage.pack)
+    """
+    result: dict[int, list[list]] = {}
+
+    for update in updates:
+        if update['type'] != 'message_new':
+            continue
+
+        message = update['object']['message']
+        result.setdefault(jump_hash(message['peer_id'], partitions), []).append(UpdateMessage.pack(message))
+
+    return result
@@ -1,4 +1,3 @@
-import json
 import random
 from typing import Optional
 
@@ -6,9 +5,14 @@ import aiohttp
 from aiohttp.client import ClientSession
 
 from app.base.base_accessor import BaseAccessor
+from app.base.ttl_cache import TTLCache
 from app.config import BotConfig, Config
 from app.databases import Databases
+from app.store.vk_api.batcher import ExecuteBatcher
+from app.store.vk_api.checkpoint import TsCheckpoint
 from app.store.vk_api.dataclasses import Message, User
+from app.store.vk_api.outbox import Outbox
+from app.store.vk_api.request import FORM_HEADERS, RequestBuilder
 from app.app_logger import get_logger
 
 logger = get_logger(__file__)
@@ -21,6 +25,11 @@ class VkApiAccessor(BaseAccessor):
         self.key: Optional[str] = None
         self.server: Optional[str] = None
         self.ts: Optional[int] = None
+        self.requests = RequestBuilder(self.cfg.token)
+        self.checkpoint = TsCheckpoint(config.poller.checkpoint_path, config.poller.checkpoint_fsync_interval)
+        self.users: TTLCache[User] = TTLCache(self.cfg.users_cache_size, self.cfg.users_cache_ttl)
+        self.batcher = ExecuteBatcher(self._request, rate=self.cfg.rate_limit, window=self.cfg.batch_window)
+        self.outbox = Outbox(self._send_message, senders=self.cfg.senders)
 
     @property
     def cfg(self) -> BotConfig:
@@ -31,119 +40,98 @@ class VkApiAccessor(BaseAccessor):
         self.session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(ssl=False))
         await self._get_long_poll_service()
 
+        # resume from the last published events, VK answers with failed=1 if they are too old
+        saved_ts = self.checkpoint.load()
+        if saved_ts is not None:
+            logger.info(f'Long poll resumed from ts {saved_ts}')
+            self.ts = saved_ts
+
     async def disconnect(self):
         logger.info('VkApi accessor disconnected')
+        await self.outbox.close(timeout=5)
+        await self.batcher.close()
 
         if self.session is not None:
             await self.session.close()
             self.session = None
 
-    @staticmethod
-    def _build_query(host: str, method: str, params: dict) -> str:
-        url = host + method + "?"
-        if "v" not in params:
-            params["v"] = "5.131"
-
-        url += '&'.join(
-            f'{k}={v if not isinstance(v, list) else ",".join(tuple(map(str, v)))}' for k, v in params.items())
-
-        return url
-
-    async def _get_long_poll_service(self):
-        group_id = self.cfg.group_id
-        token = self.cfg.token
-
-        query = self._build_query(
-            host='https://api.vk.com/',
-            method='method/groups.getLongPollServer',
-            params={'group_id': group_id, 'access_token': token}
-        )
+    async def _request(self, method: str, params: dict) -> dict:
+        body = self.requests.body(params)
+        async with self.session.post(self.requests.url(method), data=body, headers=FORM_HEADERS) as resp:
+            return await resp.json()
 
-        async with self.session.get(query) as response:
-            response_body = (await response.json())['response']
-            self.key = response_body['key']
-            self.server = response_body['server']
+    async def _get_long_poll_service(self, update_ts: bool = True):
+        response_body = (await self._request('groups.getLongPollServer', {'group_id': self.cfg.group_id}))['response']
+        self.key = response_body['key']
+        self.server = response_body['server']
+        if update_ts:
             self.ts = response_body['ts']
 
-    async def poll(self) -> str:
-        query = self._build_query(
-            host=self.server,
-            method='',
-            params={
-                'act': 'a_check',
-                'key': self.key,
-                'wait': 25,
-                'mode': 2,
-                'ts': self.ts
-            })
+    async def poll(self) -> list[dict]:
+        """
+        Events after self.ts, self.ts is moved past them.
+        On failed=1 events were lost on the VK side, polling goes on from the new ts;
+        on failed=2 the key has expired; on failed=3 both key and ts have to be requested again.
+        """
+        params = {
+            'act': 'a_check',
+            'key': self.key,
+            'wait': 25,
+            'mode': 2,
+            'ts': self.ts
+        }
 
-        async with self.session.get(query) as response:
+        async with self.session.get(self.server, params=params) as response:
             resp_json: dict = await response.json()
+
+        failed = resp_json.get('failed')
+        if failed is None:
+            self.ts = resp_json['ts']
+            return resp_json['updates']
+
+        logger.warning(f'Long poll failed: {resp_json}')
+        if failed == 1:
             self.ts = resp_json['ts']
-            raw_updates = resp_json['updates']
+        elif failed == 2:
+            await self._get_long_poll_service(update_ts=False)
+        else:
+            await self._get_long_poll_service()
 
-        return json.dumps(resp_json)
+        return []
+
+    def commit_ts(self, ts: str, force_sync: bool = False) -> None:
+        """Called after the events before ts are published"""
+        self.checkpoint.save(ts, force_sync)
 
     async def send_message(self, message: Message) -> None:
-        query_params = {
+        """Does not wait for the message to be sent"""
+        self.outbox.put(message)
+
+    async def _send_message(self, message: Message) -> None:
+        await self.batcher.call('messages.send', {
             'message': message.text,
-            'access_token': self.cfg.token,
-            'random_id': random.randint(-2147483648, 2147483648),
+            'random_id': random.randint(-2147483648, 2147483647),
             'peer_id': message.peer_id,
-            'keyboard': message.kbd.serialize(),
+            'keyboard': message.kbd,
             'attachment': message.photos,
-        }
-
-        query = self._build_query(
-            host='https://api.vk.com/',
-            method='method/messages.send',
-            params=query_params
-        )
-
-        async with self.session.get(query) as resp:
-            _ = await resp.json()
+        })
 
     async def get_chat(self, peer_id: int) -> dict:
-        query = self._build_query(
-            host='https://api.vk.com/',
-            method='method/messages.getConversationMembers',
-            params={
-                'access_token': self.cfg.token,
-                'peer_id': peer_id,
-            }
-        )
-
-        async with self.session.get(query) as resp:
-            return await resp.json()
-
-    async def get_conversations(self):
-        query = self._build_query(
-            host='https://api.vk.com/',
-            method='method/messages.getConversations',
-            params={
-                'access_token': self.cfg.token,
-            }
-        )
+        return await self._request('messages.getConversationMembers', {'peer_id': peer_id})
 
-        async with self.session.get(query) as resp:
-            return await resp.json()
-            # return await resp.json()
+    async def get_conversations(self) -> dict:
+        return await self._request('messages.getConversations', {})
 
     async def get_users(self, vk_ids: list[int]) -> list[User]:
-        query = self._build_query(
-            host='https://api.vk.com/',
-            method='method/users.get',
-            params={
-                'access_token': self.cfg.token,
-                'user_ids': vk_ids,
-                'fields': [
-                    'bdate',
-                    'city',
-                ]
-            }
-        )
-
-        async with self.session.get(query) as resp:
-            data = await resp.json()
-
-        return [User.from_dict(u) for u in data['response']]
+        missed = [vk_id for vk_id in vk_ids if self.users.get(vk_id) is None]
+        if missed:
+            users = await self.batcher.call('users.get', {
+                'user_ids': missed,
+                'fields': ['bdate', 'city'],
+            })
+            for raw in users:
+                user = User.from_dict(raw)
+                self.users.set(user.vk_id, user)
+
+        found = (self.users.get(vk_id) for vk_id in vk_ids)
+        return [user for user in found if user is not None]
@@ -0,0 +1,142 @@
+import asyncio
+import json
+import time
+from asyncio import Future, Task
+from typing import Any, Awaitable, Callable, Optional
+
+from app.game.keyboards import Keyboard
+from app.store.vk_api.exceptions import VkApiError
+
+MAX_EXECUTE_CALLS = 25
+
+Request = Callable[[str, dict], Awaitable[dict]]
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float) -> None:
+        self._rate = rate
+        self._capacity = capacity
+        self._tokens = capacity
+        self._updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self._capacity, self._tokens + (now - self._updated_at) * self._rate)
+                self._updated_at = now
+
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+
+                await asyncio.sleep((1 - self._tokens) / self._rate)
+
+
+def _script_value(value: Any) -> str:
+    if isinstance(value, Keyboard):
+        return value.script
+    if isinstance(value, (list, tuple)):
+        value = ','.join(map(str, value))
+
+    return json.dumps(value, ensure_ascii=False)
+
+
+def _script_params(params: dict) -> str:
+    return '{' + ','.join(f'"{k}":{_script_value(v)}' for k, v in params.items() if v is not None) + '}'
+
+
+def execute_code(calls: list[tuple[str, dict]]) -> str:
+    """VKScript returning the list of the call results in the same order"""
+    return 'return [' + ','.join(f'API.{method}({_script_params(params)})' for method, params in calls) + '];'
+
+
+class ExecuteBatcher:
+    """
+    Calls made within `window` seconds are packed into one `execute` request (up to 25 calls),
+    the results are handed back to the awaiting coroutines. A single call is sent as it is.
+    All HTTP requests share one token bucket.
+    """
+
+    def __init__(self, request: Request, rate: float, window: float) -> None:
+        self._request = request
+        self._window = window
+        self._bucket = TokenBucket(rate, capacity=rate)
+        self._pending: list[tuple[str, dict, Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._requests: set[Task] = set()
+
+    async def call(self, method: str, params: dict) -> Any:
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((method, params, future))
+
+        if len(self._pending) >= MAX_EXECUTE_CALLS:
+            self._flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self._window, self._flush)
+
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        while self._pending:
+            batch, self._pending = self._pending[:MAX_EXECUTE_CALLS], self._pending[MAX_EXECUTE_CALLS:]
+            task = asyncio.create_task(self._send(batch))
+            self._requests.add(task)
+            task.add_done_callback(self._requests.discard)
+
+    async def _send(self, batch: list[tuple[str, dict, Future]]) -> None:
+        try:
+            await self._bucket.acquire()
+            if len(batch) == 1:
+                method, params, _ = batch[0]
+                results = [await self._call_one(method, params)]
+            else:
+                results = await self._execute(batch)
+        except asyncio.CancelledError:
+            for _, _, future in batch:
+                future.cancel()
+            raise
+        except Exception as e:
+            results = [e] * len(batch)
+
+        for idx, (method, _, future) in enumerate(batch):
+            if future.done():
+                continue
+
+            res = results[idx] if idx < len(results) else VkApiError(method, 0, 'no result in execute response')
+            if isinstance(res, Exception):
+                future.set_exception(res)
+            else:
+                future.set_result(res)
+
+    async def _call_one(self, method: str, params: dict) -> Any:
+        data = await self._request(method, params)
+        if 'error' in data:
+            return VkApiError.from_dict(method, data['error'])
+
+        return data['response']
+
+    async def _execute(self, batch: list[tuple[str, dict, Future]]) -> list:
+        data = await self._request('execute', {'code': execute_code([(m, p) for m, p, _ in batch])})
+        if 'error' in data:
+            raise VkApiError.from_dict('execute', data['error'])
+
+        # a failed call returns false, its error goes to execute_errors in the order of failures
+        errors = iter(data.get('execute_errors', []))
+        results = []
+        for (method, _, _), res in zip(batch, data['response']):
+            if res is False:
+                results.append(VkApiError.from_dict(method, next(errors, {})))
+            else:
+                results.append(res)
+
+        return results
+
+    async def close(self) -> None:
+        self._flush()
+        await asyncio.gather(*self._requests, return_exceptions=True)
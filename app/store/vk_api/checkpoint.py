@@ -0,0 +1,53 @@
+import os
+import time
+from typing import Optional
+
+from app.app_logger import get_logger
+
+logger = get_logger(__file__)
+
+
+class TsCheckpoint:
+    """
+    The last published long poll ts in a local file. The file is replaced atomically,
+    so it always holds a whole value; fsync is done not more often than every `fsync_interval`
+    seconds, a crash may bring back an older ts (the worker skips the repeated events).
+    """
+
+    def __init__(self, path: str, fsync_interval: float) -> None:
+        self._path = path
+        self._fsync_interval = fsync_interval
+        self._synced_at = 0.0
+        self._saved: Optional[str] = None
+
+    def load(self) -> Optional[str]:
+        try:
+            with open(self._path) as f:
+                ts = f.read().strip()
+        except FileNotFoundError:
+            return None
+
+        self._saved = ts or None
+        return self._saved
+
+    def save(self, ts: str, force_sync: bool = False) -> None:
+        ts = str(ts)
+        if ts == self._saved and not force_sync:
+            return
+
+        directory = os.path.dirname(self._path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        sync = force_sync or time.monotonic() - self._synced_at >= self._fsync_interval
+        tmp_path = self._path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(ts)
+            if sync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_path, self._path)
+
+        if sync:
+            self._synced_at = time.monotonic()
+        self._saved = ts
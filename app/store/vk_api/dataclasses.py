@@ -45,19 +45,37 @@ class Message:
 
 @dataclass
 class UpdateMessage:
-    from_id: int
+    """
+    The fields of message_new the worker needs. The poller forwards a message as a plain list
+    in the order of __slots__ (see pack/unpack).
+    """
+
+    __slots__ = ('peer_id', 'from_id', 'id', 'conversation_message_id', 'text', 'payload')
+
     peer_id: int
-    text: str
+    from_id: int
     id: int
+    conversation_message_id: Optional[int]
+    text: str
     payload: Optional[str]
 
+    @staticmethod
+    def pack(raw: dict) -> list:
+        """Raw message of a message_new update"""
+        return [
+            raw['peer_id'],
+            raw['from_id'],
+            raw['id'],
+            raw.get('conversation_message_id'),
+            raw['text'],
+            raw.get('payload'),
+        ]
 
-@dataclass
-class UpdateObject:
-    message: UpdateMessage
-
+    @staticmethod
+    def unpack(packed: list) -> 'UpdateMessage':
+        return UpdateMessage(*packed)
 
-@dataclass
-class Update:
-    type: str
-    object: UpdateObject
+    @property
+    def dedup_key(self) -> str:
+        """id is 0 for messages in group chats, conversation_message_id is unique within the peer"""
+        return f'{self.peer_id}:{self.conversation_message_id if self.conversation_message_id else self.id}'
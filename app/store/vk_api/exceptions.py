@@ -0,0 +1,10 @@
+class VkApiError(Exception):
+    def __init__(self, method: str, code: int, msg: str) -> None:
+        super().__init__(f'{method}: [{code}] {msg}')
+        self.method = method
+        self.code = code
+        self.msg = msg
+
+    @classmethod
+    def from_dict(cls, method: str, raw: dict) -> 'VkApiError':
+        return cls(raw.get('method', method), raw.get('error_code', 0), raw.get('error_msg', ''))
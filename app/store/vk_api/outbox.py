@@ -0,0 +1,95 @@
+import asyncio
+from asyncio import Task
+from collections import deque
+from typing import Awaitable, Callable, Optional
+
+from app.store.vk_api.dataclasses import Message
+
+from app.app_logger import get_logger
+
+logger = get_logger(__file__)
+
+MAX_TEXT_LENGTH = 4096
+TEXT_SEPARATOR = '\n\n'
+
+
+def coalesce(messages: list[Message]) -> list[Message]:
+    """
+    Consecutive texts of one chat are glued into one message. The keyboard of the
+    glued message is the keyboard of its last part: the earlier ones would be replaced by it anyway.
+    Messages with attachments are sent as they are.
+    """
+    result: list[Message] = []
+
+    for msg in messages:
+        prev = result[-1] if result else None
+        if (prev is not None and not prev.photos and not msg.photos
+                and len(prev.text) + len(TEXT_SEPARATOR) + len(msg.text) <= MAX_TEXT_LENGTH):
+            result[-1] = Message(peer_id=msg.peer_id, text=prev.text + TEXT_SEPARATOR + msg.text, kbd=msg.kbd)
+        else:
+            result.append(msg)
+
+    return result
+
+
+class Outbox:
+    """
+    Outgoing messages are put without waiting and sent by `senders` background tasks.
+    Messages of one chat keep their order and are never sent in parallel.
+    """
+
+    def __init__(self, send: Callable[[Message], Awaitable[None]], senders: int) -> None:
+        self._send = send
+        self._senders_qty = senders
+        self._pending: dict[int, deque[Message]] = {}
+        self._scheduled: set[int] = set()
+        self._ready: Optional[asyncio.Queue] = None
+        self._senders: list[Task] = []
+
+    def put(self, message: Message) -> None:
+        if not self._senders:
+            self._start()
+
+        peer_id = message.peer_id
+        self._pending.setdefault(peer_id, deque()).append(message)
+
+        # the chat is waiting in the queue or being sent right now, it will be picked up again
+        if peer_id not in self._scheduled:
+            self._scheduled.add(peer_id)
+            self._ready.put_nowait(peer_id)
+
+    def _start(self) -> None:
+        self._ready = asyncio.Queue()
+        self._senders = [asyncio.create_task(self._sender()) for _ in range(self._senders_qty)]
+
+    async def _sender(self) -> None:
+        while True:
+            peer_id = await self._ready.get()
+            try:
+                for msg in coalesce(list(self._pending.pop(peer_id))):
+                    try:
+                        await self._send(msg)
+                    except Exception as e:
+                        logger.exception(f'Exception during sending message to {peer_id}: {e}')
+            finally:
+                if peer_id in self._pending:
+                    self._ready.put_nowait(peer_id)
+                else:
+                    self._scheduled.discard(peer_id)
+
+                self._ready.task_done()
+
+    async def close(self, timeout: float) -> None:
+        """Sends what was put before, gives up after timeout"""
+        if not self._senders:
+            return
+
+        try:
+            await asyncio.wait_for(self._ready.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f'Outbox closed with {len(self._pending)} chats not sent')
+
+        for task in self._senders:
+            task.cancel()
+        await asyncio.gather(*self._senders, return_exceptions=True)
+        self._senders = []
@@ -0,0 +1,37 @@
+from typing import Any
+from urllib.parse import quote_plus
+
+from app.game.keyboards import Keyboard
+
+API_URL = 'https://api.vk.com/method/'
+API_VERSION = '5.131'
+
+FORM_HEADERS = {'Content-Type': 'application/x-www-form-urlencoded'}
+
+
+def encode_value(value: Any) -> str:
+    if isinstance(value, Keyboard):
+        return value.encoded
+    if isinstance(value, (list, tuple)):
+        value = ','.join(map(str, value))
+
+    return quote_plus(str(value))
+
+
+class RequestBuilder:
+    """
+    Builds form-encoded bodies of the API requests.
+    The parameters sent with every request (token, version) are encoded once.
+    """
+
+    def __init__(self, token: str, version: str = API_VERSION) -> None:
+        self._static = f'access_token={encode_value(token)}&v={encode_value(version)}'
+
+    @staticmethod
+    def url(method: str) -> str:
+        return API_URL + method
+
+    def body(self, params: dict) -> bytes:
+        parts = [f'{k}={encode_value(v)}' for k, v in params.items() if v is not None]
+        parts.append(self._static)
+        return '&'.join(parts).encode()
@@ -0,0 +1,78 @@
+import asyncio
+from asyncio import Future, Task
+from collections import deque
+from typing import Awaitable, Callable
+
+from app.store.vk_api.dataclasses import UpdateMessage
+
+from app.app_logger import get_logger
+
+logger = get_logger(__file__)
+
+
+class ChatDispatcher:
+    """
+    Shards updates by peer_id: updates of one chat are handled strictly one after another,
+    different chats are handled concurrently (no more than `concurrency` at the same time).
+    """
+
+    def __init__(self, handler: Callable[[UpdateMessage], Awaitable[None]], concurrency: int) -> None:
+        self._handler = handler
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._queues: dict[int, deque[tuple[UpdateMessage, Future]]] = {}
+        self._tasks: dict[int, Task] = {}
+
+    @property
+    def active_chats(self) -> int:
+        return len(self._tasks)
+
+    async def dispatch(self, updates: list[UpdateMessage]) -> None:
+        """
+        Wait until every update of the batch is handled, re-raise the first failure.
+        The updates are queued before the first await, so batches keep the order they are dispatched in.
+        """
+        loop = asyncio.get_running_loop()
+        futures = []
+
+        for update in updates:
+            peer_id = update.peer_id
+            future = loop.create_future()
+            self._queues.setdefault(peer_id, deque()).append((update, future))
+            futures.append(future)
+
+            if peer_id not in self._tasks:
+                self._tasks[peer_id] = asyncio.create_task(self._drain(peer_id))
+
+        results = await asyncio.gather(*futures, return_exceptions=True)
+        for res in results:
+            if isinstance(res, BaseException):
+                raise res
+
+    async def _drain(self, peer_id: int) -> None:
+        queue = self._queues[peer_id]
+        try:
+            while queue:
+                update, future = queue.popleft()
+                async with self._semaphore:
+                    try:
+                        await self._handler(update)
+                    except asyncio.CancelledError:
+                        future.cancel()
+                        raise
+                    except Exception as e:
+                        future.set_exception(e)
+                    else:
+                        future.set_result(None)
+        finally:
+            del self._queues[peer_id]
+            del self._tasks[peer_id]
+
+            for _, future in queue:
+                future.cancel()
+
+    async def close(self) -> None:
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+
+        await asyncio.gather(*tasks, return_exceptions=True)
@@ -11,12 +11,13 @@ from app.game.game import GameCtx
 from app.game.logic import do_force_cancel
 from app.game.states import States
 from app.store import setup_store, Store
-from app.store.vk_api.dataclasses import Update, UpdateObject, UpdateMessage
+from app.store.vk_api.dataclasses import UpdateMessage
 
 from app.store.players.accessor import PlayersAccessor
 from app.store.vk_api.accessor import VkApiAccessor
 from app.base.base_game_accessor import BaseGameAccessor
 from app.store.game_settings.accessor import GameSettingsAccessor
+from app.worker.dispatcher import ChatDispatcher
 
 from app.app_logger import get_logger
 
@@ -28,6 +29,8 @@ class Worker:
         self.store = store
         self.databases = databases
         self.config = config
+        self.dispatcher = ChatDispatcher(self.handle_update, config.worker.concurrency)
+        self.in_flight: set[asyncio.Task] = set()
 
     @property
     def vk_api(self) -> VkApiAccessor:
@@ -60,46 +63,79 @@ class Worker:
 
     async def stop(self) -> None:
         logger.info('Poller stopping ...')
+        await self.rabbit.cancel_consumers()
+
+        if self.in_flight:
+            logger.info(f'Waiting for {len(self.in_flight)} batches in flight')
+            await asyncio.wait(self.in_flight, timeout=self.config.worker.shutdown_timeout)
+
+        await self.dispatcher.close()
+        # the batches cut short by close() are rejected back to the queue before the connection is closed
+        await asyncio.gather(*self.in_flight, return_exceptions=True)
+
         await self.store.disconnect_for_worker()
         await self.databases.disconnect_for_worker()
         logger.info('Poller stopped')
 
     async def handle_rabbit_msg(self, msg: IncomingMessage) -> None:
-        async with msg.process():
-            updates_json = json.loads(msg.body.decode(encoding='utf-8'))['updates']
-            logger.info(f'Updates: {updates_json}')
-            if updates_json:
-                await self.handle_updates(self._pack_updates(updates_json))
-
-    async def handle_updates(self, updates: list[Update]) -> None:
+        """
+        Several batches are processed at the same time (up to prefetch_count per channel),
+        so they finish out of order. Each of them is acked on its own delivery tag
+        only after all of its updates have been handled. A batch that failed or was cancelled
+        on stop is returned to the queue; a body that cannot be parsed is dropped.
+        """
+        task = asyncio.current_task()
+        self.in_flight.add(task)
+        try:
+            async with msg.process(requeue=True, ignore_processed=True):
+                try:
+                    updates = self._unpack_updates(json.loads(msg.body))
+                except (ValueError, KeyError, TypeError) as e:
+                    logger.error(f'Rabbit message {msg.delivery_tag} is dropped, bad body: {e!r}')
+                    return
+
+                logger.info(f'Updates: {updates}')
+                if updates:
+                    # no awaits before this point: the batches of a chat are queued in the order of delivery
+                    await self.dispatcher.dispatch(updates)
+        except Exception as e:
+            logger.exception(f'Exception during processing rabbit message {msg.delivery_tag}: {e}')
+        finally:
+            self.in_flight.discard(task)
+
+    async def handle_update(self, msg: UpdateMessage) -> None:
+        """
+        Updates redelivered after a poller restart are skipped. An update is marked as handled
+        only after its context has been saved: if the worker fails before, it is handled again.
+        The check is made here, in the queue of the chat, so it cannot reorder the updates.
+        """
         import app.game.handlers  # DO NOT DELETE
-        for update in updates:
-            msg = update.object.message
-            async with GameCtx(self.g_accessor, msg.peer_id, msg).proxy() as ctx:
-                if ctx.state is None:
-                    ctx.state = States.WAITING_FOR_TRIGGER
 
-                accessors = GAccessors(self.vk_api, self.p_accessor, self.gs_accessor)
+        if (await self.g_accessor.updates_handled([msg.dedup_key]))[0]:
+            logger.info(f'Skipped repeated update {msg.dedup_key}')
+            return
 
-                try:
-                    await ctx.state.handler(ctx, accessors)
-                except Exception as e:
-                    logger.exception(f'Exception during processing bot logic: "{e}"')
-                    await do_force_cancel(ctx, accessors)
+        async with GameCtx(self.g_accessor, msg.peer_id, msg).proxy() as ctx:
+            # a chat without state waits for the trigger, there is nothing to save for it
+            state = States.WAITING_FOR_TRIGGER if ctx.state is None else ctx.state
+
+            accessors = GAccessors(self.vk_api, self.p_accessor, self.gs_accessor)
+
+            try:
+                await state.handler(ctx, accessors)
+            except Exception as e:
+                logger.exception(f'Exception during processing bot logic: "{e}"')
+                await do_force_cancel(ctx, accessors)
+
+        await self.g_accessor.mark_updates_handled([msg.dedup_key], self.config.worker.dedup_ttl)
 
     @staticmethod
-    def _pack_updates(raw_updates: dict) -> list[Update]:
-        return [
-            Update(
-                type=u['type'],
-                object=UpdateObject(
-                    message=UpdateMessage(
-                        from_id=u['object']['message']['from_id'],
-                        text=u['object']['message']['text'],
-                        id=u['object']['message']['id'],
-                        peer_id=u['object']['message']['peer_id'],
-                        payload=u['object']['message'].get('payload')
-                    ))) for u in raw_updates if u['type'] == 'message_new']
+    def _unpack_updates(body) -> list[UpdateMessage]:
+        # batches published by an older poller: {'updates': [<raw update>, ...]}
+        if isinstance(body, dict):
+            body = [UpdateMessage.pack(u['object']['message']) for u in body['updates'] if u['type'] == 'message_new']
+
+        return [UpdateMessage.unpack(packed) for packed in body]
 
 
 def setup_worker(config_path: str) -> Worker:
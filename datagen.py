@@ -797,6 +797,7 @@ def generate_stats() -> PlayerStats:
         max_bet=max_bet,
         max_win=max_win,
         average_bet=average_bet,
+        total_bet=average_bet * number_of_games,
     )
 
 
@@ -5,6 +5,7 @@ from aiohttp.web import run_app
 
 from app.worker.worker import setup_worker, run_worker
 from app.poller.poller import run_poller, setup_poller
+from app.maintenance.jobs import run_job, rebuild_leaderboards, rebuild_chat_summaries, fill_total_bets, import_players
 
 from app.app_logger import get_logger
 
@@ -13,7 +14,8 @@ logger = get_logger(__file__)
 
 @click.command()
 @click.option('--service', default='poller', help='Choose service to run')
-def main(service: str) -> None:
+@click.option('--path', default='players.json', help='NDJSON file for the import service')
+def main(service: str, path: str) -> None:
     logger.info(f'Service is "{service}"')
     cfg_path = os.path.join(os.path.dirname(__file__), 'config.yml')
 
@@ -21,6 +23,10 @@ def main(service: str) -> None:
         'api': lambda: run_app(setup_app(cfg_path)),
         'poller': lambda: run_poller(setup_poller(cfg_path)),
         'worker': lambda: run_worker(setup_worker(cfg_path)),
+        'rebuild-leaderboards': lambda: run_job(cfg_path, rebuild_leaderboards),
+        'rebuild-chats': lambda: run_job(cfg_path, rebuild_chat_summaries),
+        'fill-total-bets': lambda: run_job(cfg_path, fill_total_bets),
+        'import': lambda: run_job(cfg_path, import_players(path)),
     }
 
     try: